@@ -32,17 +32,29 @@ class Conf():
 
         # common
         add('--database-url', env_var='DATABASE_URL', required=False, help='database connection url', default='')
-        add('--steemd-url', env_var='STEEMD_URL', required=False, help='steemd/jussi endpoint', default='https://api.steemit.com')
+        add('--database-replica-urls', env_var='DATABASE_REPLICA_URLS', required=False, help='comma-separated read replica urls (server only)', default='')
+        add('--steemd-url', env_var='STEEMD_URL', required=False, help='steemd/jussi endpoint(s), comma-separated', default='https://api.steemit.com')
         add('--muted-accounts-url', env_var='MUTED_ACCOUNTS_URL', required=False, help='url to flat list of muted accounts', default='')
 
         # server
         add('--http-server-port', type=int, env_var='HTTP_SERVER_PORT', default=8080)
+        add('--workers', type=int, env_var='WORKERS', help='number of server processes sharing the port (SO_REUSEPORT)', default=1)
+        add('--post-cache-size', type=int, env_var='POST_CACHE_SIZE', help='max number of pre-built post objects kept in memory', default=20000)
+        add('--response-cache-size', type=int, env_var='RESPONSE_CACHE_SIZE', help='max number of API responses cached per block (0 to disable)', default=10000)
+        add('--response-stale-ms', type=int, env_var='RESPONSE_STALE_MS', help='max wait for a refresh before serving previous block response', default=250)
+        add('--batch-concurrency', type=int, env_var='BATCH_CONCURRENCY', help='max elements of each JSON-RPC batch executed concurrently', default=8)
+        add('--db-driver', env_var='DB_DRIVER', choices=['aiopg', 'asyncpg'], help='db driver used by server (asyncpg requires `asyncpg` extra)', default='aiopg')
+        add('--db-pool-size', type=int, env_var='DB_POOL_SIZE', help='max connections to primary db per server process', default=20)
+        add('--db-replica-pool-size', type=int, env_var='DB_REPLICA_POOL_SIZE', help='max connections to each replica per server process', default=20)
+        add('--replica-max-lag', type=int, env_var='REPLICA_MAX_LAG', help='max blocks a replica may trail primary before reads skip it', default=10)
+        add('--coalesce-queries', type=strtobool, env_var='COALESCE_QUERIES', help='share results of identical concurrent SELECTs', default=True)
 
         # sync
-        add('--max-workers', type=int, env_var='MAX_WORKERS', help='max workers for batch requests', default=4)
-        add('--max-batch', type=int, env_var='MAX_BATCH', help='max chunk size for batch requests', default=50)
+        add('--max-workers', type=int, env_var='MAX_WORKERS', help='cap on concurrent requests of tuned batch calls', default=4)
+        add('--max-batch', type=int, env_var='MAX_BATCH', help='cap on chunk size of tuned batch calls', default=50)
         add('--trail-blocks', type=int, env_var='TRAIL_BLOCKS', help='number of blocks to trail head by', default=2)
         add('--sync-to-s3', type=strtobool, env_var='SYNC_TO_S3', help='alternative healthcheck for background sync service', default=False)
+        add('--snapshot-dir', env_var='SNAPSHOT_DIR', help='directory for indexer memory snapshots (account map, post filter); disabled if blank', default='')
 
         # test/debug
         add('--log-level', env_var='LOG_LEVEL', default='INFO')
@@ -65,7 +65,7 @@ class Db:
         return self._trx_active
 
     def query(self, sql, **kwargs):
-        """Perform a (*non-`SELECT`*) write query."""
+        """Perform a (*non-`SELECT`*, or `pg_notify`) write query."""
 
         # if prepared tuple, unpack
         if isinstance(sql, tuple):
@@ -153,6 +153,22 @@ class Db:
 
         return (sql, values)
 
+    @staticmethod
+    def build_bulk_update(table, rows, pk, types):
+        """Generates a single UPDATE for many rows w/ array bindings.
+
+        `rows` are dicts sharing the same keys (including `pk`); `types`
+        maps each key to its SQL type, used to cast the bound arrays.
+        """
+        fields = list(rows[0].keys())
+        update = ', '.join([k+" = v."+k for k in fields if k != pk])
+        arrays = ', '.join(["CAST(:%s AS %s[])" % (k, types[k]) for k in fields])
+        sql = "UPDATE %s t SET %s FROM unnest(%s) AS v(%s) WHERE t.%s = v.%s"
+        sql = sql % (table, update, arrays, ', '.join(fields), pk, pk)
+        values = {k: [row[k] for row in rows] for k in fields}
+
+        return (sql, values)
+
     def _sql_text(self, sql):
         if sql in self._prep_sql:
             query = self._prep_sql[sql]
@@ -186,7 +202,7 @@ class Db:
         """Check if `sql` is a DELETE, UPDATE, COMMIT, ALTER, etc."""
         action = sql.strip()[0:6].strip()
         if action == 'SELECT':
-            return False
+            return sql.strip().startswith('SELECT pg_notify(')
         if action in ['DELETE', 'UPDATE', 'INSERT', 'COMMIT', 'START',
                       'ALTER', 'TRUNCA', 'CREATE', 'DROP I']:
             return True
@@ -3,7 +3,8 @@
 import time
 import logging
 
-from hive.db.schema import setup, reset_autovac, build_metadata, teardown, DB_VERSION
+from hive.db.schema import (setup, reset_autovac, build_metadata, teardown,
+                            DB_VERSION, FEED_FANOUT_MAX)
 from hive.db.adapter import Db
 
 log = logging.getLogger(__name__)
@@ -84,6 +85,7 @@ class DbState:
         to_locate = [
             'hive_posts_ix3', # (author, depth, id)
             'hive_posts_ix4', # (parent_id, id, is_deleted=0)
+            'hive_posts_ix5', # (root_id, id, is_deleted=0)
             'hive_follows_ix5a', # (following, state, created_at, follower)
             'hive_follows_ix5b', # (follower, state, created_at, following)
             'hive_reblogs_ix1', # (post_id, account, created_at)
@@ -94,6 +96,9 @@ class DbState:
             'hive_posts_cache_ix8', # (category, payout, depth, paidout=0)
             'hive_posts_cache_ix9a', # (depth, payout, post_id, paidout=0)
             'hive_posts_cache_ix9b', # (category, depth, payout, post_id, paidout=0)
+            'hive_tag_ranks_ix2', # (tag, sc_trend, post_id)
+            'hive_tag_ranks_ix3', # (tag, sc_hot, post_id)
+            'hive_tag_ranks_ix4', # (tag, promoted, post_id, promoted>0)
             'hive_accounts_ix3', # (vote_weight, name VPO)
             'hive_accounts_ix4', # (id, name)
             'hive_accounts_ix5', # (cached_at, name)
@@ -259,6 +264,43 @@ class DbState:
             cls.db().query("CREATE INDEX hive_posts_ix4 ON hive_posts (parent_id, id) WHERE is_deleted = '0'")
             cls._set_ver(12)
 
+        if cls._ver == 12:
+            cls.db().query("ALTER TABLE hive_posts ADD COLUMN root_id integer")
+            cls._backfill_root_ids()
+            cls.db().query("CREATE INDEX hive_posts_ix5 ON hive_posts (root_id, id) WHERE is_deleted = '0'")
+            cls._set_ver(13)
+
+        if cls._ver == 13:
+            build_metadata().tables['hive_tag_ranks'].create(cls.db().engine())
+            from hive.indexer.cached_post import CachedPost
+            CachedPost.rebuild_tag_ranks()
+            cls._set_ver(14)
+
+        if cls._ver == 14:
+            build_metadata().tables['hive_feeds'].create(cls.db().engine())
+            from hive.indexer.feed_cache import FeedCache
+            FeedCache.rebuild_feeds()
+            cls._set_ver(15)
+
+        if cls._ver == 15:
+            cls.db().query("ALTER TABLE hive_feed_cache ADD COLUMN idx integer")
+            from hive.indexer.feed_cache import FeedCache
+            FeedCache.renumber()
+            cls.db().query("CREATE INDEX hive_feed_cache_ix2 ON hive_feed_cache (account_id, idx)")
+            cls._set_ver(16)
+
+        if cls._ver == 16:
+            build_metadata().tables['hive_tag_stats'].create(cls.db().engine())
+            from hive.indexer.cached_post import CachedPost
+            CachedPost.rebuild_tag_stats()
+            cls._set_ver(17)
+
+        if cls._ver == 17:
+            cls.db().query("ALTER TABLE hive_accounts ADD COLUMN fanout boolean NOT NULL DEFAULT '1'")
+            cls.db().query("UPDATE hive_accounts SET fanout = '0' WHERE followers > :fanout_max",
+                           fanout_max=FEED_FANOUT_MAX)
+            cls._set_ver(18)
+
         reset_autovac(cls.db())
 
         log.info("[HIVE] db version: %d", cls._ver)
@@ -269,6 +311,18 @@ class DbState:
         #    cls._set_ver(2)
 
 
+    @classmethod
+    def _backfill_root_ids(cls):
+        """Populate hive_posts.root_id, one depth level at a time."""
+        cls.db().query("UPDATE hive_posts SET root_id = id WHERE depth = 0")
+        max_depth = cls.db().query_one("SELECT MAX(depth) FROM hive_posts") or 0
+        for depth in range(1, max_depth + 1):
+            log.info("[INIT] backfill root_id at depth %d of %d", depth, max_depth)
+            cls.db().query("""UPDATE hive_posts child SET root_id = parent.root_id
+                                FROM hive_posts parent
+                               WHERE child.parent_id = parent.id
+                                 AND child.depth = :depth""", depth=depth)
+
     @classmethod
     def _set_ver(cls, ver):
         """Sets the db/schema version number. Enforce sequential."""
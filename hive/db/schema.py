@@ -12,7 +12,14 @@ from geoalchemy2.types import Geography
 
 #pylint: disable=line-too-long, too-many-lines
 
-DB_VERSION = 12
+DB_VERSION = 18
+
+# authors with more followers are not fanned out to `hive_feeds`; their
+# entries are read from `hive_feed_cache` when a feed is requested.
+# `hive_accounts.fanout` only flips back on below FEED_FANOUT_MIN, so an
+# author hovering around the limit does not rebuild feeds on each follow.
+FEED_FANOUT_MAX = 5000
+FEED_FANOUT_MIN = 4500
 
 def build_metadata():
     """Build schema def with SqlAlchemy"""
@@ -55,6 +62,7 @@ def build_metadata():
 
         sa.Column('followers', sa.Integer, nullable=False, server_default='0'),
         sa.Column('following', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('fanout', sa.Boolean, nullable=False, server_default='1'),
 
         sa.Column('proxy', VARCHAR(16), nullable=False, server_default=''),
         sa.Column('post_count', sa.Integer, nullable=False, server_default='0'),
@@ -81,6 +89,7 @@ def build_metadata():
         'hive_posts', metadata,
         sa.Column('id', sa.Integer, primary_key=True),
         sa.Column('parent_id', sa.Integer),
+        sa.Column('root_id', sa.Integer),
         sa.Column('author', VARCHAR(16), nullable=False),
         sa.Column('permlink', VARCHAR(255), nullable=False),
         sa.Column('community', VARCHAR(16), nullable=False),
@@ -99,6 +108,7 @@ def build_metadata():
         sa.UniqueConstraint('author', 'permlink', name='hive_posts_ux1'),
         sa.Index('hive_posts_ix3', 'author', 'depth', 'id', postgresql_where=sql_text("is_deleted = '0'")), # API: author blog/comments
         sa.Index('hive_posts_ix4', 'parent_id', 'id', postgresql_where=sql_text("is_deleted = '0'")), # API: fetching children
+        sa.Index('hive_posts_ix5', 'root_id', 'id', postgresql_where=sql_text("is_deleted = '0'")), # API: fetching threads
         mysql_engine='InnoDB',
         mysql_default_charset='utf8mb4'
     )
@@ -122,6 +132,33 @@ def build_metadata():
         mysql_default_charset='utf8mb4'
     )
 
+    sa.Table(
+        'hive_tag_ranks', metadata,
+        sa.Column('tag', sa.String(32), nullable=False),
+        sa.Column('post_id', sa.Integer, nullable=False),
+        sa.Column('sc_trend', sa.Float(precision=6), nullable=False),
+        sa.Column('sc_hot', sa.Float(precision=6), nullable=False),
+        sa.Column('promoted', sa.types.DECIMAL(10, 3), nullable=False),
+        sa.UniqueConstraint('tag', 'post_id', name='hive_tag_ranks_ux1'), # core
+        sa.Index('hive_tag_ranks_ix1', 'post_id'), # core
+        sa.Index('hive_tag_ranks_ix2', 'tag', 'sc_trend', 'post_id'), # API: tag trending
+        sa.Index('hive_tag_ranks_ix3', 'tag', 'sc_hot', 'post_id'), # API: tag hot
+        sa.Index('hive_tag_ranks_ix4', 'tag', 'promoted', 'post_id', postgresql_where=sql_text("promoted > 0")), # API: tag promoted
+        mysql_engine='InnoDB',
+        mysql_default_charset='utf8mb4'
+    )
+
+    sa.Table(
+        'hive_tag_stats', metadata,
+        sa.Column('category', VARCHAR(255), primary_key=True),
+        sa.Column('total_posts', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('top_posts', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('total_payouts', sa.types.DECIMAL(16, 3), nullable=False, server_default='0'),
+        sa.Index('hive_tag_stats_ix1', 'total_payouts', 'category'), # API: trending tags
+        mysql_engine='InnoDB',
+        mysql_default_charset='utf8mb4'
+    )
+
     sa.Table(
         'hive_follows', metadata,
         sa.Column('follower', sa.Integer, nullable=False),
@@ -233,8 +270,23 @@ def build_metadata():
         sa.Column('post_id', sa.Integer, nullable=False),
         sa.Column('account_id', sa.Integer, nullable=False),
         sa.Column('created_at', sa.DateTime, nullable=False),
+        sa.Column('idx', sa.Integer), # dense per-account sequence, by created_at
         sa.UniqueConstraint('post_id', 'account_id', name='hive_feed_cache_ux1'), # core
         sa.Index('hive_feed_cache_ix1', 'account_id', 'post_id', 'created_at'), # API (and rebuild?)
+        sa.Index('hive_feed_cache_ix2', 'account_id', 'idx'), # API: blog by index
+        mysql_engine='InnoDB',
+        mysql_default_charset='utf8mb4'
+    )
+
+    sa.Table(
+        'hive_feeds', metadata,
+        sa.Column('account_id', sa.Integer, nullable=False),
+        sa.Column('post_id', sa.Integer, nullable=False),
+        sa.Column('source_id', sa.Integer, nullable=False),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+        sa.UniqueConstraint('account_id', 'source_id', 'post_id', name='hive_feeds_ux1'), # core
+        sa.Index('hive_feeds_ix1', 'account_id', 'created_at'), # API: home feed
+        sa.Index('hive_feeds_ix2', 'post_id'), # core
         mysql_engine='InnoDB',
         mysql_default_charset='utf8mb4'
     )
@@ -1,7 +1,10 @@
 """Accounts indexer."""
 
 import logging
+import os
 
+from array import array
+from collections import OrderedDict
 from datetime import datetime
 from toolz import partition_all
 
@@ -12,6 +15,7 @@ from hive.utils.normalize import rep_log10, vests_amount
 from hive.utils.timer import Timer
 from hive.utils.account import safe_profile_metadata
 from hive.utils.unique_fifo import UniqueFIFO
+from hive.utils.account_map import AccountMap
 
 log = logging.getLogger(__name__)
 
@@ -21,22 +25,85 @@ class Accounts:
     """Manages account id map, dirty queue, and `hive_accounts` table."""
 
     # name->id map
-    _ids = {}
+    _ids = AccountMap()
 
     # fifo queue
     _dirty = UniqueFIFO()
 
-    # in-mem id->rank map
-    _ranks = {}
+    # id-indexed hashes of the last written values of each column group;
+    # groups which did not change since are not written again
+    _hashes = {}
+
+    # cached column groups, and types for bulk updates
+    GROUPS = {
+        'stats': ('created_at', 'proxy', 'post_count', 'reputation',
+                  'proxy_weight', 'vote_weight', 'active_at'),
+        'profile': ('display_name', 'about', 'location', 'website',
+                    'facebook', 'twitter', 'instagram', 'youtube',
+                    'couchsurfing', 'profile_image', 'cover_image'),
+        'raw': ('raw_json',)}
+    TYPES = dict(name='varchar', created_at='timestamp', proxy='varchar',
+                 post_count='integer', reputation='real', proxy_weight='real',
+                 vote_weight='real', active_at='timestamp',
+                 raw_json='text', **{k: 'varchar' for k in GROUPS['profile']})
+
+    # id -> vote_weight as of the last rank update, for accounts whose
+    # weight may have changed since (None: registered since); tracked
+    # once ranks were fully computed
+    _moved = None
+
+    # id-indexed reputations last written from post data (0: unknown)
+    _reps = array('d')
+
+    # rewrite the snapshot once this many accounts were added since
+    SNAPSHOT_MAX_OVERLAY = 10000
 
     # account core methods
     # --------------------
 
     @classmethod
-    def load_ids(cls):
-        """Load a full (name: id) dict into memory."""
+    def load_ids(cls, snapshot_dir=None):
+        """Load the full name->id map into memory.
+
+        If `snapshot_dir` is given, the map is loaded from a snapshot
+        there and caught up with accounts created since; the snapshot
+        is (re)written when missing, invalid or far behind."""
         assert not cls._ids, "id map already loaded"
-        cls._ids = dict(DB.query_all("SELECT name, id FROM hive_accounts"))
+        if not snapshot_dir:
+            cls._ids = AccountMap.from_rows(DB.query_all("SELECT name, id FROM hive_accounts"))
+            return
+
+        path = os.path.join(snapshot_dir, 'accounts.map')
+        cls._ids = cls._load_snapshot(path)
+        if cls._ids is None:
+            log.info("[INIT] building account map snapshot")
+            cls._ids = AccountMap.from_rows(DB.query_all("SELECT name, id FROM hive_accounts"))
+            cls._ids.save(path)
+        elif cls._ids.overlay_size > cls.SNAPSHOT_MAX_OVERLAY:
+            cls._ids.save(path)
+
+    @classmethod
+    def _load_snapshot(cls, path):
+        """Load and catch up a snapshot; None if missing or inconsistent."""
+        try:
+            amap = AccountMap.load(path)
+        except (OSError, ValueError) as e:
+            log.info("[INIT] account map snapshot unusable: %s", repr(e))
+            return None
+
+        sql = "SELECT name, id FROM hive_accounts WHERE id > :id"
+        for name, _id in DB.query_all(sql, id=amap.max_id):
+            amap.add(name, _id)
+
+        # ids are never reused; a count mismatch means a different db
+        count = DB.query_one("SELECT COUNT(*) FROM hive_accounts")
+        if count != len(amap):
+            log.warning("[INIT] account map snapshot has %d accounts, db %d",
+                        len(amap), count)
+            return None
+        log.info("[INIT] loaded %d accounts from snapshot (+%d new)",
+                 len(amap), amap.overlay_size)
+        return amap
 
     @classmethod
     def clear_ids(cls):
@@ -46,8 +113,9 @@ class Accounts:
     @classmethod
     def get_id(cls, name):
         """Get account id by name. Throw if not found."""
-        assert name in cls._ids, "account does not exist or was not registered"
-        return cls._ids[name]
+        _id = cls._ids.get(name)
+        assert _id is not None, "account does not exist or was not registered"
+        return _id
 
     @classmethod
     def exists(cls, name):
@@ -76,7 +144,9 @@ class Accounts:
         # pull newly-inserted ids and merge into our map
         sql = "SELECT name, id FROM hive_accounts WHERE name IN :names"
         for name, _id in DB.query_all(sql, names=tuple(new_names)):
-            cls._ids[name] = _id
+            cls._ids.add(name, _id)
+            if cls._moved is not None:
+                cls._moved[_id] = None
 
 
     # account cache methods
@@ -87,6 +157,28 @@ class Accounts:
         """Marks given accounts as needing an update."""
         return cls._dirty.extend(accounts)
 
+    @classmethod
+    def reputation_sqls(cls, reps):
+        """Prepare a bulk update of changed account reputations.
+
+        `reps` maps names to raw steemd reputation as reported on fetched
+        posts, which saves refetching accounts after each vote."""
+        rows = []
+        for name, raw in reps.items():
+            _id = cls._ids.get(name)
+            if _id is None:
+                continue
+            if _id >= len(cls._reps):
+                size = _id + 1 - len(cls._reps) + len(cls._reps) // 2
+                cls._reps.frombytes(bytes(8 * size))
+            rep = rep_log10(raw)
+            if cls._reps[_id] != rep:
+                cls._reps[_id] = rep
+                rows.append(dict(name=name, reputation=rep))
+        if not rows:
+            return []
+        return [DB.build_bulk_update('hive_accounts', rows, 'name', cls.TYPES)]
+
     @classmethod
     def dirty_all(cls):
         """Marks all accounts as dirty. Use to rebuild entire table."""
@@ -118,11 +210,67 @@ class Accounts:
         return count
 
     @classmethod
-    def fetch_ranks(cls):
-        """Rebuild account ranks and store in memory for next update."""
-        sql = "SELECT id FROM hive_accounts ORDER BY vote_weight DESC"
-        for rank, _id in enumerate(DB.query_col(sql)):
-            cls._ranks[_id] = rank + 1
+    def update_ranks(cls):
+        """Recompute account ranks by `vote_weight`, writing changed rows.
+
+        The first call ranks all accounts. Later calls only rerank the
+        band of the ordering spanned by the old and new positions of
+        accounts which moved since; ranks outside it are unaffected. An
+        account registered since shifts every account below it, so its
+        band runs from its position to the bottom of the ordering."""
+        if cls._moved is None:
+            cls._rerank()
+            cls._moved = {}
+            return
+
+        moved, cls._moved = cls._moved, {}
+        if not moved:
+            return
+        sql = "SELECT id, vote_weight FROM hive_accounts WHERE id IN :ids"
+        keys, added = [], []
+        for _id, weight in DB.query_all(sql, ids=tuple(moved)):
+            if moved[_id] is None:
+                added.append((weight, _id))
+            elif moved[_id] != weight:
+                keys.extend([(weight, _id), (moved[_id], _id)])
+
+        if added and keys and max(added) >= min(keys):
+            cls._rerank(max(keys + added))
+            return
+        if keys:
+            cls._rerank(max(keys), min(keys))
+        if added:
+            # after the band above, as its base may lie within it
+            cls._rerank(max(added))
+
+    @classmethod
+    def _rerank(cls, top=None, bot=None):
+        """Rank accounts with `(vote_weight, id)` keys within `top` and
+        `bot` (inclusive; None: unbounded), offset by the stored rank of
+        the account just above `top`. Weights are compared as REAL, the
+        type they were read from."""
+        where, args = [], {}
+        key = "(vote_weight, id) %s (CAST(:%s_weight AS REAL), :%s_id)"
+        for name, bound, op in (('top', top, '<='), ('bot', bot, '>=')):
+            if bound:
+                where.append(key % (op, name, name))
+                args.update({name + '_weight': bound[0], name + '_id': bound[1]})
+
+        base = 0
+        if top:
+            base = DB.query_one("""SELECT rank FROM hive_accounts
+                                    WHERE %s
+                                 ORDER BY vote_weight, id LIMIT 1"""
+                                % (key % ('>', 'top', 'top')),
+                                top_weight=top[0], top_id=top[1]) or 0
+
+        DB.query("""UPDATE hive_accounts a SET rank = r.rank
+                      FROM (SELECT id, :base + row_number() OVER (
+                                       ORDER BY vote_weight DESC, id DESC) AS rank
+                              FROM hive_accounts %s) r
+                     WHERE a.id = r.id AND a.rank != r.rank"""
+                 % ('WHERE ' + ' AND '.join(where) if where else ''),
+                 base=base, **args)
 
     @classmethod
     def _cache_accounts(cls, accounts, steem, trx=True):
@@ -135,16 +283,61 @@ class Accounts:
             batch = steem.get_accounts(name_batch)
 
             timer.batch_lap()
-            sqls = [cls._sql(acct, cached_at) for acct in batch]
+            sqls, hashes = cls._sqls(batch, cached_at)
+            cls._track_moves([_id for group, _id, _ in hashes if group == 'stats'])
             DB.batch_queries(sqls, trx)
+            for group, _id, digest in hashes:
+                cls._hashes[group][_id] = digest
 
             timer.batch_finish(len(batch))
             if trx or len(accounts) > 1000:
                 log.info(timer.batch_status())
 
     @classmethod
-    def _sql(cls, account, cached_at):
-        """Prepare a SQL query from a steemd account."""
+    def _track_moves(cls, ids):
+        """Remember pre-update weights of accounts about to be written."""
+        if cls._moved is None:
+            return
+        ids = [_id for _id in ids if _id not in cls._moved]
+        if ids:
+            sql = "SELECT id, vote_weight FROM hive_accounts WHERE id IN :ids"
+            for _id, weight in DB.query_all(sql, ids=tuple(ids)):
+                cls._moved[_id] = weight
+
+    @classmethod
+    def _sqls(cls, accounts, cached_at):
+        """Prepare bulk SQL queries for a batch of steemd accounts.
+
+        Every account gets its `cached_at` bumped; other columns are
+        written only for groups whose content hash changed. Returns the
+        queries and the `(group, id, hash)` entries to save once run."""
+        changed = {}
+        hashes = []
+        for account in accounts:
+            _id = cls.get_id(account['name'])
+            row = {}
+            for group, values in cls._values(account).items():
+                digest = hash(tuple(values.values()))
+                known = cls._hashes.setdefault(group, array('q'))
+                if _id >= len(known):
+                    known.frombytes(bytes(8 * (_id + 1 - len(known) + len(known) // 2)))
+                if known[_id] != digest:
+                    row.update(values)
+                    hashes.append((group, _id, digest))
+            if row:
+                row['name'] = account['name']
+                changed.setdefault(tuple(row.keys()), []).append(row)
+
+        names = tuple(account['name'] for account in accounts)
+        sqls = [("UPDATE hive_accounts SET cached_at = :date WHERE name IN :names",
+                 dict(date=cached_at, names=names))]
+        for rows in changed.values():
+            sqls.append(DB.build_bulk_update('hive_accounts', rows, 'name', cls.TYPES))
+        return (sqls, hashes)
+
+    @classmethod
+    def _values(cls, account):
+        """Get cached column values of a steemd account, by group."""
         vote_weight = (vests_amount(account['vesting_shares'])
                        + vests_amount(account['received_vesting_shares'])
                        - vests_amount(account['delegated_vesting_shares']))
@@ -173,7 +366,6 @@ class Accounts:
             'proxy_weight': vests_amount(account['vesting_shares']),
             'vote_weight':  vote_weight,
             'active_at':    active_at,
-            'cached_at':    cached_at,
 
             'display_name':  profile['name'],
             'about':         profile['about'],
@@ -189,10 +381,5 @@ class Accounts:
 
             'raw_json': json.dumps(account)}
 
-        # update rank field, if present
-        _id = cls.get_id(account['name'])
-        if _id in cls._ranks:
-            values['rank'] = cls._ranks[_id]
-
-        bind = ', '.join([k+" = :"+k for k in list(values.keys())][1:])
-        return ("UPDATE hive_accounts SET %s WHERE name = :name" % bind, values)
+        return {group: OrderedDict((k, values[k]) for k in cols if k in values)
+                for group, cols in cls.GROUPS.items()}
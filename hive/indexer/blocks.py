@@ -30,6 +30,11 @@ class Blocks:
         sql = "SELECT created_at FROM hive_blocks ORDER BY num DESC LIMIT 1"
         return str(DB.query_one(sql) or '')
 
+    @classmethod
+    def notify_head(cls, num):
+        """Announce new head block to API servers, delivered on COMMIT."""
+        DB.query("SELECT pg_notify('hive_block', :num)", num=str(num))
+
     @classmethod
     def process(cls, block):
         """Process a single block. Always wrap in a transaction!"""
@@ -54,6 +59,8 @@ class Blocks:
         # deltas in memory and update follow/er counts in bulk.
         Follow.flush(trx=False)
 
+        if last_num:
+            cls.notify_head(last_num)
         DB.query("COMMIT")
 
     @classmethod
@@ -203,18 +210,45 @@ class Blocks:
 
             # remove all recent records
             DB.query("DELETE FROM hive_feed_cache  WHERE created_at >= :date", date=date)
+            DB.query("DELETE FROM hive_feeds       WHERE created_at >= :date", date=date)
             DB.query("DELETE FROM hive_reblogs     WHERE created_at >= :date", date=date)
-            DB.query("DELETE FROM hive_follows     WHERE created_at >= :date", date=date) #*
+            followers = DB.query_col("""DELETE FROM hive_follows WHERE created_at >= :date
+                                        RETURNING follower""", date=date) #*
+
+            # feed entries backfilled on follow carry post dates; drop
+            # those of follows which no longer exist
+            if followers:
+                DB.query("""DELETE FROM hive_feeds f
+                             WHERE f.account_id IN :ids
+                               AND NOT EXISTS (SELECT 1 FROM hive_follows hf
+                                                WHERE hf.follower = f.account_id
+                                                  AND hf.following = f.source_id
+                                                  AND hf.state = 1)""",
+                         ids=tuple(set(followers)))
 
             # remove posts: core, tags, cache entries
             if post_ids:
+                DB.query("""UPDATE hive_tag_stats s
+                               SET total_posts = s.total_posts - c.total_posts,
+                                   top_posts = s.top_posts - c.top_posts,
+                                   total_payouts = s.total_payouts - c.total_payouts
+                              FROM (SELECT category, COUNT(*) total_posts,
+                                           SUM(CASE WHEN depth = 0 THEN 1 ELSE 0 END) top_posts,
+                                           SUM(payout) total_payouts
+                                      FROM hive_posts_cache
+                                     WHERE post_id IN :ids AND is_paidout = '0'
+                                  GROUP BY category) c
+                             WHERE s.category = c.category""", ids=post_ids)
                 DB.query("DELETE FROM hive_posts_cache WHERE post_id IN :ids", ids=post_ids)
                 DB.query("DELETE FROM hive_post_tags   WHERE post_id IN :ids", ids=post_ids)
+                DB.query("DELETE FROM hive_tag_ranks   WHERE post_id IN :ids", ids=post_ids)
                 DB.query("DELETE FROM hive_posts       WHERE id      IN :ids", ids=post_ids)
 
             DB.query("DELETE FROM hive_payments    WHERE block_num = :num", num=num)
             DB.query("DELETE FROM hive_blocks      WHERE num = :num", num=num)
 
+        cls.notify_head(cls.head_num())
         DB.query("COMMIT")
+        Posts.clear_cache()
         log.warning("[FORK] recovery complete")
         # TODO: manually re-process here the blocks which were just popped.
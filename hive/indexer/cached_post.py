@@ -7,6 +7,7 @@ import ujson as json
 
 from toolz import partition_all
 from hive.db.adapter import Db
+from hive.db.db_state import DbState
 
 from hive.utils.post import post_basic, post_legacy, post_payout, post_stats
 from hive.utils.timer import Timer
@@ -85,7 +86,6 @@ class CachedPost:
     def vote(cls, author, permlink, pid=None):
         """Handle a post dirtied by a `vote` op."""
         cls._dirty('upvote', author, permlink, pid)
-        Accounts.dirty(set([author])) # rep changed
 
     @classmethod
     def insert(cls, author, permlink, pid):
@@ -107,7 +107,9 @@ class CachedPost:
          - author/permlink is unique and always references the same post
          - you can always get_content on any author/permlink you see in an op
         """
+        DB.query(cls._TAG_STATS_SUB, id=post_id)
         DB.query("DELETE FROM hive_posts_cache WHERE post_id = :id", id=post_id)
+        DB.query("DELETE FROM hive_tag_ranks WHERE post_id = :id", id=post_id)
 
         # if it was queued for a write, remove it
         url = author+'/'+permlink
@@ -228,8 +230,6 @@ class CachedPost:
         stale data if we didn't sweep, and only waited for incoming
         votes before an update.
         """
-        from hive.indexer.posts import Posts
-
         sql = """SELECT post_id FROM hive_posts_cache
                   WHERE is_paidout = '0' AND payout_at <= :date"""
         ids = DB.query_col(sql, date=date)
@@ -238,8 +238,7 @@ class CachedPost:
 
         sql = """SELECT id, author, permlink
                  FROM hive_posts WHERE id IN :ids"""
-        results = DB.query_all(sql, ids=tuple(ids))
-        return Posts.save_ids_from_tuples(results)
+        return DB.query_all(sql, ids=tuple(ids))
 
     @classmethod
     def dirty_paidouts(cls, date):
@@ -259,12 +258,10 @@ class CachedPost:
     @classmethod
     def _select_missing_tuples(cls, last_cached_id, limit=1000000):
         """Fetch posts inserted into main posts table but not cache."""
-        from hive.indexer.posts import Posts
         sql = """SELECT id, author, permlink, promoted FROM hive_posts
                   WHERE is_deleted = '0' AND id > :id
                ORDER BY id LIMIT :limit"""
-        results = DB.query_all(sql, id=last_cached_id, limit=limit)
-        return Posts.save_ids_from_tuples(results)
+        return DB.query_all(sql, id=last_cached_id, limit=limit)
 
     @classmethod
     def dirty_missing(cls, limit=250000):
@@ -325,6 +322,7 @@ class CachedPost:
         for tups in partition_all(1000, tuples):
             timer.batch_start()
             buffer = []
+            reps = {}
 
             post_args = [tup[0].split('/') for tup in tups]
             posts = steem.get_content_batch(post_args)
@@ -336,6 +334,9 @@ class CachedPost:
                 if post['author']:
                     if pid in catmap: post['category'] = catmap[pid]
                     buffer.extend(cls._sql(pid, post, level=level))
+                    reps[post['author']] = post['author_reputation']
+                    for vote in post['active_votes']:
+                        reps[vote['voter']] = vote['reputation']
                 else:
                     # When a post has been deleted (or otherwise DNE),
                     # steemd simply returns a blank post  object w/ all
@@ -361,6 +362,8 @@ class CachedPost:
 
                 cls._bump_last_id(pid)
 
+            buffer.extend(Accounts.reputation_sqls(reps))
+
             timer.batch_lap()
             DB.batch_queries(buffer, trx)
 
@@ -520,7 +523,85 @@ class CachedPost:
             sql = cls._insert(values)
         else:
             sql = cls._update(values)
-        return [sql] + tag_sqls
+
+        # tag ranks are derived from the rows written above; root posts only
+        rank_sqls = []
+        if not post['depth']:
+            rank_sqls = cls._tag_rank_sqls(pid, level)
+
+        # tag stats are rebuilt after initial sync
+        if DbState.is_initial_sync():
+            return [sql] + tag_sqls + rank_sqls
+
+        # tag stats: retract the row's previous contribution, add the new
+        return ([(cls._TAG_STATS_SUB, dict(id=pid))] + [sql] + tag_sqls
+                + rank_sqls + [(cls._TAG_STATS_ADD, dict(id=pid))])
+
+    @classmethod
+    def _tag_rank_sqls(cls, pid, level):
+        """Generate SQL to sync `hive_tag_ranks` with a post's cache row.
+
+        Score changes are applied in place; any other write (which may
+        change tags or paidout status) rebuilds the post's rank rows.
+        """
+        if level in ['upvote', 'recount']:
+            sql = """UPDATE hive_tag_ranks r
+                        SET sc_trend = c.sc_trend, sc_hot = c.sc_hot,
+                            promoted = c.promoted
+                       FROM hive_posts_cache c
+                      WHERE r.post_id = :id AND c.post_id = :id"""
+            return [(sql, dict(id=pid))]
+
+        return [("DELETE FROM hive_tag_ranks WHERE post_id = :id", dict(id=pid)),
+                (cls._TAG_RANKS_INSERT + " AND c.post_id = :id", dict(id=pid))]
+
+    _TAG_RANKS_INSERT = """
+        INSERT INTO hive_tag_ranks (tag, post_id, sc_trend, sc_hot, promoted)
+             SELECT t.tag, c.post_id, c.sc_trend, c.sc_hot, c.promoted
+               FROM hive_post_tags t
+               JOIN hive_posts_cache c ON c.post_id = t.post_id
+              WHERE c.is_paidout = '0' AND c.depth = 0"""
+
+    @classmethod
+    def rebuild_tag_ranks(cls):
+        """Rebuild `hive_tag_ranks` from tags and unpaid cache rows."""
+        log.info("[INIT] rebuilding hive_tag_ranks")
+        DB.query("TRUNCATE TABLE hive_tag_ranks")
+        DB.query(cls._TAG_RANKS_INSERT)
+
+    # subtract an unpaid post's contribution from its category's stats
+    _TAG_STATS_SUB = """
+        UPDATE hive_tag_stats s
+           SET total_posts = s.total_posts - 1,
+               top_posts = s.top_posts - (CASE WHEN c.depth = 0 THEN 1 ELSE 0 END),
+               total_payouts = s.total_payouts - c.payout
+          FROM hive_posts_cache c
+         WHERE c.post_id = :id AND c.is_paidout = '0'
+           AND s.category = c.category"""
+
+    # add an unpaid post's contribution to its category's stats
+    _TAG_STATS_ADD = """
+        INSERT INTO hive_tag_stats (category, total_posts, top_posts, total_payouts)
+             SELECT category, 1, CASE WHEN depth = 0 THEN 1 ELSE 0 END, payout
+               FROM hive_posts_cache
+              WHERE post_id = :id AND is_paidout = '0'
+        ON CONFLICT (category) DO UPDATE
+                SET total_posts = hive_tag_stats.total_posts + EXCLUDED.total_posts,
+                    top_posts = hive_tag_stats.top_posts + EXCLUDED.top_posts,
+                    total_payouts = hive_tag_stats.total_payouts + EXCLUDED.total_payouts"""
+
+    @classmethod
+    def rebuild_tag_stats(cls):
+        """Rebuild `hive_tag_stats` from unpaid cache rows."""
+        log.info("[INIT] rebuilding hive_tag_stats")
+        DB.query("TRUNCATE TABLE hive_tag_stats")
+        DB.query("""
+            INSERT INTO hive_tag_stats (category, total_posts, top_posts, total_payouts)
+                 SELECT category, COUNT(*),
+                        SUM(CASE WHEN depth = 0 THEN 1 ELSE 0 END), SUM(payout)
+                   FROM hive_posts_cache
+                  WHERE is_paidout = '0'
+               GROUP BY category""")
 
     @classmethod
     def _tag_sqls(cls, pid, tags, diff=True):
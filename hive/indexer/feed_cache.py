@@ -4,6 +4,7 @@ import logging
 import time
 from hive.db.adapter import Db
 from hive.db.db_state import DbState
+from hive.db.schema import FEED_FANOUT_MAX, FEED_FANOUT_MIN
 
 log = logging.getLogger(__name__)
 
@@ -14,17 +15,49 @@ class FeedCache:
 
     The feed cache allows for efficient querying of posts + reblogs,
     savings us from expensive queries. Effectively a materialized view.
+    Each account's entries are numbered 0..n-1 by `idx`, in order of
+    `created_at`; entries are appended, and deletes renumber the tail.
+
+    Also maintains `hive_feeds`, each account's home feed: entries of
+    followed accounts are fanned out on write, except for authors whose
+    `fanout` flag is off (see `update_fanout`). Each feed holds entries back to a
+    horizon (at most FEED_DAYS old, trimmed to about FEED_SIZE rows);
+    within it, the feed is complete.
     """
 
+    FEED_SIZE = 500
+    FEED_DAYS = 30
+    TRIM_CHUNK = 1000
+
+    # accounts whose `hive_feeds` gained entries since the last trim
+    _touched = set()
+
+    # head block date less FEED_DAYS
+    _CUTOFF = """((SELECT created_at FROM hive_blocks ORDER BY num DESC LIMIT 1)
+                  - INTERVAL '%d days')""" % FEED_DAYS
+
     @classmethod
     def insert(cls, post_id, account_id, created_at):
         """Inserts a [re-]post by an account into feed."""
         assert not DbState.is_initial_sync(), 'writing to feed cache in sync'
-        sql = """INSERT INTO hive_feed_cache (account_id, post_id, created_at)
-                      VALUES (:account_id, :id, :created_at)
+        sql = """INSERT INTO hive_feed_cache (account_id, post_id, created_at, idx)
+                      VALUES (:account_id, :id, :created_at, (
+                              SELECT COALESCE(MAX(idx) + 1, 0) FROM hive_feed_cache
+                               WHERE account_id = :account_id))
                  ON CONFLICT (account_id, post_id) DO NOTHING"""
         DB.query(sql, account_id=account_id, id=post_id, created_at=created_at)
 
+        sql = """INSERT INTO hive_feeds (account_id, post_id, source_id, created_at)
+                      SELECT follower, :id, :account_id, :created_at
+                        FROM hive_follows
+                       WHERE following = :account_id AND state = 1
+                         AND (SELECT fanout FROM hive_accounts
+                               WHERE id = :account_id)
+                 ON CONFLICT DO NOTHING
+                   RETURNING account_id"""
+        cls._touched.update(DB.query_col(sql, account_id=account_id,
+                                         id=post_id, created_at=created_at))
+
     @classmethod
     def delete(cls, post_id, account_id=None):
         """Remove a post from feed cache.
@@ -35,11 +68,142 @@ class FeedCache:
         to be removed.
         """
         assert not DbState.is_initial_sync(), 'writing to feed cache in sync'
-        sql = "DELETE FROM hive_feed_cache WHERE post_id = :id"
+        match = "post_id = :id"
+        if account_id:
+            match = match + " AND account_id = :account_id"
+
+        # close the gap in each affected account's sequence
+        sql = """UPDATE hive_feed_cache f SET idx = f.idx - 1
+                   FROM hive_feed_cache gone
+                  WHERE gone.%s
+                    AND f.account_id = gone.account_id
+                    AND f.idx > gone.idx""" % match.replace('AND ', 'AND gone.')
+        DB.query(sql, account_id=account_id, id=post_id)
+        DB.query("DELETE FROM hive_feed_cache WHERE " + match,
+                 account_id=account_id, id=post_id)
+
+        sql = "DELETE FROM hive_feeds WHERE post_id = :id"
         if account_id:
-            sql = sql + " AND account_id = :account_id"
+            sql = sql + " AND source_id = :account_id"
         DB.query(sql, account_id=account_id, id=post_id)
 
+    @classmethod
+    def follow(cls, follower, following):
+        """Add a newly followed account's entries to follower's feed.
+
+        Only entries within the feed's current horizon are added."""
+        assert not DbState.is_initial_sync(), 'writing to feed cache in sync'
+        sql = """INSERT INTO hive_feeds (account_id, post_id, source_id, created_at)
+                      SELECT :follower, post_id, account_id, created_at
+                        FROM hive_feed_cache
+                       WHERE account_id = :following
+                         AND created_at >= GREATEST(%s, (
+                               SELECT MIN(created_at) FROM hive_feeds
+                                WHERE account_id = :follower))
+                         AND (SELECT fanout FROM hive_accounts
+                               WHERE id = :following)
+                 ON CONFLICT DO NOTHING""" % cls._CUTOFF
+        DB.query(sql, follower=follower, following=following)
+        cls._touched.add(follower)
+
+    @classmethod
+    def unfollow(cls, follower, following):
+        """Remove an unfollowed account's entries from follower's feed."""
+        assert not DbState.is_initial_sync(), 'writing to feed cache in sync'
+        sql = """DELETE FROM hive_feeds
+                  WHERE account_id = :follower AND source_id = :following"""
+        DB.query(sql, follower=follower, following=following)
+
+    @classmethod
+    def update_fanout(cls, account_ids):
+        """Flip `fanout` of accounts whose follower count crossed a limit.
+
+        Fan-out stops above FEED_FANOUT_MAX followers and resumes below
+        FEED_FANOUT_MIN. On each flip the author's entries are added to
+        (within each feed's horizon) or purged from followers' feeds."""
+        assert not DbState.is_initial_sync(), 'writing to feed cache in sync'
+        if not account_ids:
+            return
+        sql = """UPDATE hive_accounts SET fanout = NOT fanout
+                  WHERE id IN :ids
+                    AND ((fanout AND followers > :fanout_max)
+                      OR (NOT fanout AND followers < :fanout_min))
+              RETURNING id, fanout"""
+        flipped = DB.query_all(sql, ids=tuple(account_ids),
+                               fanout_max=FEED_FANOUT_MAX,
+                               fanout_min=FEED_FANOUT_MIN)
+        for account_id, fanout in flipped:
+            if not fanout:
+                log.info("[HIVE] stop fan-out of account %d", account_id)
+                DB.query("DELETE FROM hive_feeds WHERE source_id = :id",
+                         id=account_id)
+                continue
+
+            log.info("[HIVE] start fan-out of account %d", account_id)
+            sql = """INSERT INTO hive_feeds (account_id, post_id, source_id, created_at)
+                          SELECT hf.follower, fc.post_id, fc.account_id, fc.created_at
+                            FROM hive_follows hf
+                            JOIN hive_feed_cache fc ON fc.account_id = hf.following
+                           WHERE hf.following = :id AND hf.state = 1
+                             AND fc.created_at >= GREATEST(%s, (
+                                   SELECT MIN(created_at) FROM hive_feeds
+                                    WHERE account_id = hf.follower))
+                     ON CONFLICT DO NOTHING
+                       RETURNING account_id""" % cls._CUTOFF
+            cls._touched.update(DB.query_col(sql, id=account_id))
+
+    @classmethod
+    def trim(cls):
+        """Drop expired entries, and the oldest beyond FEED_SIZE, from
+        feeds which gained entries since the last trim.
+
+        Feeds are trimmed by date (ties are kept), so each stays complete
+        back to its oldest entry. Untouched feeds are left alone: they
+        were within FEED_SIZE when last trimmed, and expired entries are
+        behind the horizon readers use."""
+        touched = sorted(cls._touched)
+        cls._touched = set()
+        for i in range(0, len(touched), cls.TRIM_CHUNK):
+            DB.query("""
+                DELETE FROM hive_feeds f USING (
+                    SELECT account_id, source_id, post_id FROM (
+                        SELECT account_id, source_id, post_id, created_at,
+                               rank() OVER (PARTITION BY account_id
+                                                ORDER BY created_at DESC) rnk
+                          FROM hive_feeds WHERE account_id IN :ids) ranked
+                     WHERE rnk > :size OR created_at < %s) old
+                 WHERE f.account_id = old.account_id
+                   AND f.source_id = old.source_id
+                   AND f.post_id = old.post_id
+            """ % cls._CUTOFF, ids=tuple(touched[i:i + cls.TRIM_CHUNK]),
+                     size=cls.FEED_SIZE)
+
+    @classmethod
+    def rebuild_feeds(cls):
+        """Rebuild all home feeds from `hive_feed_cache` and follows."""
+        log.info("[HIVE] Rebuilding home feeds.")
+        DB.query("START TRANSACTION")
+        DB.query("""UPDATE hive_accounts SET fanout = (followers <= :fanout_max)
+                     WHERE fanout != (followers <= :fanout_max)""",
+                 fanout_max=FEED_FANOUT_MAX)
+        DB.query("TRUNCATE TABLE hive_feeds")
+        DB.query("""
+            INSERT INTO hive_feeds (account_id, post_id, source_id, created_at)
+                 SELECT account_id, post_id, source_id, created_at FROM (
+                     SELECT hf.follower account_id, fc.post_id,
+                            fc.account_id source_id, fc.created_at,
+                            rank() OVER (PARTITION BY hf.follower
+                                             ORDER BY fc.created_at DESC) rnk
+                       FROM hive_feed_cache fc
+                       JOIN hive_follows hf ON hf.following = fc.account_id
+                                           AND hf.state = 1
+                       JOIN hive_accounts ha ON ha.id = fc.account_id
+                      WHERE fc.created_at >= %s
+                        AND ha.fanout) ranked
+                  WHERE rnk <= :size
+        """ % cls._CUTOFF, size=cls.FEED_SIZE)
+        DB.query("COMMIT")
+
     @classmethod
     def rebuild(cls, truncate=True):
         """Rebuilds the feed cache upon completion of initial sync."""
@@ -67,7 +231,24 @@ class FeedCache:
             ON CONFLICT DO NOTHING
         """)
         lap_2 = time.perf_counter()
+        cls.renumber()
         DB.query("COMMIT")
 
         log.info("[HIVE] Rebuilt hive feed cache in %ds (%d+%d)",
                  (lap_2 - lap_0), (lap_1 - lap_0), (lap_2 - lap_1))
+
+        cls.rebuild_feeds()
+
+    @classmethod
+    def renumber(cls):
+        """Assign each account's feed cache entries a dense `idx`."""
+        DB.query("""
+            UPDATE hive_feed_cache f SET idx = seq.idx
+              FROM (SELECT account_id, post_id, row_number() OVER (
+                               PARTITION BY account_id
+                                   ORDER BY created_at, post_id) - 1 idx
+                      FROM hive_feed_cache) seq
+             WHERE f.account_id = seq.account_id
+               AND f.post_id = seq.post_id
+               AND f.idx IS DISTINCT FROM seq.idx
+        """)
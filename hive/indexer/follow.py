@@ -7,6 +7,7 @@ from funcy.seqs import first
 from hive.db.adapter import Db
 from hive.db.db_state import DbState
 from hive.indexer.accounts import Accounts
+from hive.indexer.feed_cache import FeedCache
 
 log = logging.getLogger(__name__)
 
@@ -54,8 +55,10 @@ class Follow:
         if not DbState.is_initial_sync():
             if new_state == 1:
                 Follow.follow(op['flr'], op['flg'])
+                FeedCache.follow(op['flr'], op['flg'])
             if old_state == 1:
                 Follow.unfollow(op['flr'], op['flg'])
+                FeedCache.unfollow(op['flr'], op['flg'])
 
     @classmethod
     def _validated_op(cls, account, op, date):
@@ -131,6 +134,8 @@ class Follow:
 
         start = perf()
         DB.batch_queries(sqls, trx=trx)
+        if not DbState.is_initial_sync():
+            FeedCache.update_fanout(cls._delta[FOLLOWERS].keys())
         if trx:
             log.info("[SYNC] flushed %d follow deltas in %ds",
                      updated, perf() - start)
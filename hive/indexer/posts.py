@@ -1,12 +1,14 @@
 """Core posts manager."""
 
 import logging
-import collections
+import os
 
 from hive.db.adapter import Db
 from hive.db.db_state import DbState
 
 from hive.utils.normalize import load_json_key
+from hive.utils.post_meta_cache import PostMetaCache
+from hive.utils.bloom import ScalableBloomFilter
 from hive.indexer.accounts import Accounts
 from hive.indexer.cached_post import CachedPost
 from hive.indexer.feed_cache import FeedCache
@@ -19,11 +21,17 @@ DB = Db.instance()
 class Posts:
     """Handles critical/core post ops and data."""
 
-    # LRU cache for (author-permlink -> id) lookup (~400mb per 1M entries)
+    # author/permlink -> (id, depth, is_deleted, root_id, category,
+    # community); about 60 bytes per entry including table slack
     CACHE_SIZE = 2000000
-    _ids = collections.OrderedDict()
-    _hits = 0
-    _miss = 0
+    _meta = PostMetaCache(CACHE_SIZE)
+
+    # filter of all known author/permlinks; lets lookups for new posts
+    # skip the db. None until `load_filter`.
+    FILTER_ERROR_RATE = 0.01
+    _filter = None
+    _filter_skips = 0
+    _filter_fps = 0
 
     @classmethod
     def last_id(cls):
@@ -32,61 +40,94 @@ class Posts:
         return DB.query_one(sql) or 0
 
     @classmethod
-    def get_id(cls, author, permlink):
-        """Look up id by author/permlink, making use of LRU cache."""
-        url = author+'/'+permlink
-        if url in cls._ids:
-            cls._hits += 1
-            _id = cls._ids.pop(url)
-            cls._ids[url] = _id
-        else:
-            cls._miss += 1
-            sql = """SELECT id FROM hive_posts WHERE
-                     author = :a AND permlink = :p"""
-            _id = DB.query_one(sql, a=author, p=permlink)
-            if _id:
-                cls._set_id(url, _id)
+    def get_meta(cls, author, permlink):
+        """Get `(id, depth, is_deleted, root_id, category, community)`
+        of @author/permlink, or None if the post does not exist."""
+        meta = cls._meta.get(author, permlink)
+        if meta is None and cls._filter is not None \
+           and author+'/'+permlink not in cls._filter:
+            cls._filter_skips += 1
+        elif meta is None:
+            sql = """SELECT id, depth, is_deleted, COALESCE(root_id, id),
+                            category, community
+                       FROM hive_posts WHERE author = :a AND permlink = :p"""
+            row = DB.query_row(sql, a=author, p=permlink)
+            if row:
+                meta = tuple(row)
+                cls._meta.put(author, permlink, *meta)
+            elif cls._filter is not None:
+                cls._filter_fps += 1
+
+            # cache stats
+            total = cls._meta.hits + cls._meta.miss
+            if total and cls._meta.miss % 100000 == 0:
+                log.info("post lookups: %d, hits: %d (%.1f%%), entries: %d, %s",
+                         total, cls._meta.hits, 100.0*cls._meta.hits/total,
+                         len(cls._meta), cls.filter_stats())
+        return meta
 
-        # cache stats (under 10M every 10K else every 100K)
-        total = cls._hits + cls._miss
-        if total % 100000 == 0:
-            log.info("pid lookups: %d, hits: %d (%.1f%%), entries: %d",
-                     total, cls._hits, 100.0*cls._hits/total, len(cls._ids))
-
-        return _id
+    @classmethod
+    def load_filter(cls, snapshot_dir=None):
+        """Build the author/permlink filter, or load it from a snapshot.
+
+        Snapshots are caught up with posts inserted since, and rewritten
+        if anything was added."""
+        path = os.path.join(snapshot_dir, 'posts.bloom') if snapshot_dir else None
+        bloom = None
+        if path and os.path.exists(path):
+            try:
+                bloom = ScalableBloomFilter.load(path)
+            except (OSError, ValueError) as e:
+                log.warning("[INIT] post filter snapshot unusable: %s", repr(e))
+        if bloom is None:
+            capacity = max(1000000, 2 * (DB.query_one("SELECT MAX(id) FROM hive_posts") or 0))
+            bloom = ScalableBloomFilter(capacity, cls.FILTER_ERROR_RATE)
+
+        added = 0
+        sql = """SELECT id, author, permlink FROM hive_posts
+                  WHERE id > :id ORDER BY id LIMIT 1000000"""
+        while True:
+            rows = DB.query_all(sql, id=bloom.watermark)
+            if not rows:
+                break
+            for _, author, permlink in rows:
+                bloom.add(author+'/'+permlink)
+            bloom.watermark = rows[-1][0]
+            added += len(rows)
+            log.info("[INIT] post filter: %d posts, %dMB", len(bloom),
+                     bloom.nbytes // 2**20)
+
+        if path and added:
+            bloom.save(path)
+        cls._filter = bloom
+        cls._filter_skips = cls._filter_fps = 0
 
     @classmethod
-    def _set_id(cls, url, pid):
-        """Add an entry to the LRU, maintaining max size."""
-        assert pid, "no pid provided for %s" % url
-        if len(cls._ids) > cls.CACHE_SIZE:
-            cls._ids.popitem(last=False)
-        cls._ids[url] = pid
+    def filter_stats(cls):
+        """Describe filter efficiency: lookups avoided and false positives."""
+        if cls._filter is None:
+            return 'filter: off'
+        return "filter skips: %d, false positives: %d (est. rate %.4f)" % (
+            cls._filter_skips, cls._filter_fps, cls._filter.est_error_rate())
 
     @classmethod
-    def save_ids_from_tuples(cls, tuples):
-        """Skim & cache `author/permlink -> id` from external queries."""
-        for tup in tuples:
-            pid, author, permlink = (tup[0], tup[1], tup[2])
-            url = author+'/'+permlink
-            if not url in cls._ids:
-                cls._set_id(url, pid)
-        return tuples
+    def get_id(cls, author, permlink):
+        """Look up id by author/permlink, making use of cache."""
+        meta = cls.get_meta(author, permlink)
+        return meta[0] if meta else None
 
     @classmethod
     def get_id_and_depth(cls, author, permlink):
         """Get the id and depth of @author/permlink post."""
-        _id = cls.get_id(author, permlink)
-        if not _id:
+        meta = cls.get_meta(author, permlink)
+        if not meta:
             return (None, -1)
-        depth = DB.query_one("SELECT depth FROM hive_posts WHERE id = :id", id=_id)
-        return (_id, depth)
+        return (meta[0], meta[1])
 
     @classmethod
-    def is_pid_deleted(cls, pid):
-        """Check if the state of post is deleted."""
-        sql = "SELECT is_deleted FROM hive_posts WHERE id = :id"
-        return DB.query_one(sql, id=pid)
+    def clear_cache(cls):
+        """Drop cached post metadata, e.g. after popping blocks."""
+        cls._meta.clear()
 
     @classmethod
     def delete_op(cls, op):
@@ -99,29 +140,32 @@ class Posts:
     @classmethod
     def comment_op(cls, op, block_date):
         """Register new/edited/undeleted posts; insert into feed cache."""
-        pid = cls.get_id(op['author'], op['permlink'])
-        if not pid:
+        meta = cls.get_meta(op['author'], op['permlink'])
+        if not meta:
             # post does not exist, go ahead and process it.
             cls.insert(op, block_date)
-        elif not cls.is_pid_deleted(pid):
+        elif not meta[2]:
             # post exists, not deleted, thus an edit. ignore.
-            cls.update(op, block_date, pid)
+            cls.update(op, block_date, meta[0])
         else:
             # post exists but was deleted. time to reinstate.
-            cls.undelete(op, block_date, pid)
+            cls.undelete(op, block_date, meta[0])
 
     @classmethod
     def insert(cls, op, date):
         """Inserts new post records."""
-        sql = """INSERT INTO hive_posts (is_valid, parent_id, author, permlink,
+        sql = """INSERT INTO hive_posts (is_valid, parent_id, root_id, author, permlink,
                                         category, community, depth, created_at)
-                      VALUES (:is_valid, :parent_id, :author, :permlink,
+                      VALUES (:is_valid, :parent_id, :root_id, :author, :permlink,
                               :category, :community, :depth, :date)"""
-        sql += ";SELECT currval(pg_get_serial_sequence('hive_posts','id'))"
         post = cls._build_post(op, date)
+        if not post['root_id']: # top-level post is its own root
+            sql += """;UPDATE hive_posts SET root_id = id
+                       WHERE id = currval(pg_get_serial_sequence('hive_posts','id'))"""
+        sql += ";SELECT currval(pg_get_serial_sequence('hive_posts','id'))"
         result = DB.query(sql, **post)
         post['id'] = int(list(result)[0][0])
-        cls._set_id(op['author']+'/'+op['permlink'], post['id'])
+        cls._cache_post(post)
 
         if not DbState.is_initial_sync():
             CachedPost.insert(op['author'], op['permlink'], post['id'])
@@ -134,11 +178,12 @@ class Posts:
     def undelete(cls, op, date, pid):
         """Re-allocates an existing record flagged as deleted."""
         sql = """UPDATE hive_posts SET is_valid = :is_valid, is_deleted = '0',
-                   parent_id = :parent_id, category = :category,
-                   community = :community, depth = :depth
+                   parent_id = :parent_id, root_id = COALESCE(:root_id, id),
+                   category = :category, community = :community, depth = :depth
                  WHERE id = :id"""
         post = cls._build_post(op, date, pid)
         DB.query(sql, **post)
+        cls._cache_post(post)
 
         if not DbState.is_initial_sync():
             CachedPost.undelete(pid, post['author'], post['permlink'])
@@ -149,6 +194,7 @@ class Posts:
         """Marks a post record as being deleted."""
         pid, depth = cls.get_id_and_depth(op['author'], op['permlink'])
         DB.query("UPDATE hive_posts SET is_deleted = '1' WHERE id = :id", id=pid)
+        cls._meta.set_deleted(op['author'], op['permlink'])
 
         if not DbState.is_initial_sync():
             CachedPost.delete(pid, op['author'], op['permlink'])
@@ -181,6 +227,16 @@ class Posts:
         assert result, "parent of %d not found" % child_id
         return result
 
+    @classmethod
+    def _cache_post(cls, post):
+        """Cache metadata of a just written (non-deleted) post."""
+        if cls._filter is not None:
+            cls._filter.add(post['author']+'/'+post['permlink'])
+            cls._filter.watermark = max(cls._filter.watermark, post['id'])
+        cls._meta.put(post['author'], post['permlink'], post['id'],
+                      post['depth'], False, post['root_id'] or post['id'],
+                      post['category'], post['community'])
+
     @classmethod
     def _insert_feed_cache(cls, post):
         """Insert the new post into feed cache if it's not a comment."""
@@ -195,15 +251,17 @@ class Posts:
         # if this is a top-level post:
         if not op['parent_author']:
             parent_id = None
+            root_id = None # assigned own id on insert
             depth = 0
             category = op['parent_permlink']
             community = cls._get_op_community(op, date) or op['author']
 
         # this is a comment; inherit parent props.
         else:
-            parent_id = cls.get_id(op['parent_author'], op['parent_permlink'])
-            sql = "SELECT depth,category,community FROM hive_posts WHERE id=:id"
-            parent_depth, category, community = DB.query_row(sql, id=parent_id)
+            parent = cls.get_meta(op['parent_author'], op['parent_permlink'])
+            assert parent, "parent not found: @%s/%s" % (op['parent_author'],
+                                                         op['parent_permlink'])
+            parent_id, parent_depth, _, root_id, category, community = parent
             depth = parent_depth + 1
 
         # check post validity in specified context
@@ -213,7 +271,7 @@ class Posts:
             log.info("Invalid post %s in @%s", url, community)
 
         return dict(author=op['author'], permlink=op['permlink'], id=pid,
-                    is_valid=is_valid, parent_id=parent_id, depth=depth,
+                    is_valid=is_valid, parent_id=parent_id, root_id=root_id, depth=depth,
                     category=category, community=community, date=date)
 
     @classmethod
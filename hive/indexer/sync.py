@@ -16,6 +16,7 @@ from hive.steem.block.stream import MicroForkException
 
 from hive.indexer.blocks import Blocks
 from hive.indexer.accounts import Accounts
+from hive.indexer.posts import Posts
 from hive.indexer.cached_post import CachedPost
 from hive.indexer.feed_cache import FeedCache
 from hive.indexer.follow import Follow
@@ -39,9 +40,9 @@ class Sync:
         # ensure db schema up to date, check app status
         DbState.initialize()
 
-        # prefetch id->name and id->rank memory maps
-        Accounts.load_ids()
-        Accounts.fetch_ranks()
+        # prefetch id->name memory map, post filter
+        Accounts.load_ids(snapshot_dir=self._conf.get('snapshot_dir'))
+        Posts.load_filter(snapshot_dir=self._conf.get('snapshot_dir'))
 
         if DbState.is_initial_sync():
             # resume initial sync
@@ -55,6 +56,7 @@ class Sync:
             # perform cleanup if process did not exit cleanly
             CachedPost.recover_missing_posts(self._steem)
 
+        Accounts.update_ranks()
         self._update_chain_state()
 
         if self._conf.get('test_max_block'):
@@ -89,8 +91,9 @@ class Sync:
 
         log.info("[INIT] *** Initial cache build ***")
         CachedPost.recover_missing_posts(self._steem)
-        FeedCache.rebuild()
+        CachedPost.rebuild_tag_stats()
         Follow.force_recount()
+        FeedCache.rebuild() # home feeds depend on follower counts
 
     def from_checkpoints(self, chunk_size=1000):
         """Initial sync strategy: read from blocks on disk.
@@ -181,6 +184,7 @@ class Sync:
             accts = Accounts.flush(steemd, trx=False, spread=8)
             CachedPost.dirty_paidouts(block['timestamp'])
             cnt = CachedPost.flush(steemd, trx=False)
+            Blocks.notify_head(num)
             self._db.query("COMMIT")
 
             ms = (perf() - start_time) * 1000
@@ -191,7 +195,8 @@ class Sync:
                      cnt['recount'], accts, follows, ms, ' SLOW' if ms > 1000 else '')
 
             if num % 1200 == 0: #1hr
-                Accounts.fetch_ranks()
+                Accounts.update_ranks()
+                FeedCache.trim()
             if num % 100 == 0: #5min
                 log.info("[LIVE] flag 500 oldest accounts for update")
                 Accounts.dirty_oldest(500)
@@ -0,0 +1,130 @@
+"""asyncpg backend for the API server db adapter."""
+
+import asyncio
+import logging
+import re
+
+from hive.server.db import Db
+
+log = logging.getLogger(__name__)
+
+# `:name` binds; skips `::type` casts
+BIND = re.compile(r'(?<![:\w]):(\w+)')
+
+# `IN :name` / `NOT IN :name` list binds (passed as tuples)
+LIST_BIND = re.compile(r'\b(NOT\s+)?IN\s+:(\w+)', re.IGNORECASE)
+
+def translate(sql):
+    """Convert sqlalchemy-style `:name` binds to positional `$n` binds.
+
+    Returns (sql, names, list_names). `IN :x` becomes `= ANY($n)` and
+    `NOT IN :x` becomes `<> ALL($n)`, to be passed an array param.
+    """
+    names = []
+    list_names = set()
+
+    def _list_bind(match):
+        list_names.add(match.group(2))
+        op = '<> ALL' if match.group(1) else '= ANY'
+        return '%s(:%s)' % (op, match.group(2))
+
+    def _bind(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return '$%d' % (names.index(name) + 1)
+
+    sql = LIST_BIND.sub(_list_bind, sql)
+    sql = BIND.sub(_bind, sql)
+    return sql, names, list_names
+
+class _Engine:
+    """Adapts an asyncpg pool to the aiopg engine interface used by `Db`."""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def acquire(self):
+        """Acquire a connection (async context manager)."""
+        return self._pool.acquire()
+
+    @property
+    def size(self):
+        """Number of open connections."""
+        return self._pool.get_size()
+
+    @property
+    def freesize(self):
+        """Number of idle connections."""
+        return self._pool.get_idle_size()
+
+    def close(self):
+        """No-op; pool is closed gracefully in `wait_closed`."""
+        pass
+
+    async def wait_closed(self):
+        """Close pool, waiting for connections to be released."""
+        await self._pool.close()
+
+class AsyncpgDb(Db):
+    """Server db adapter on asyncpg.
+
+    Uses the binary protocol, and server-side prepared statements cached
+    per connection (via asyncpg's statement cache). Bind translation is
+    done once per distinct SQL string.
+    """
+
+    STATEMENT_CACHE_SIZE = 256
+
+    def __init__(self):
+        super().__init__()
+        self._translated = {}
+
+    @classmethod
+    async def _engine(cls, url, maxsize):
+        import asyncpg
+        # sqlalchemy-style url scheme is not accepted by asyncpg
+        dsn = re.sub(r'^postgresql\+\w+://', 'postgresql://', url)
+        pool = await asyncpg.create_pool(
+            dsn, min_size=1, max_size=maxsize,
+            statement_cache_size=cls.STATEMENT_CACHE_SIZE)
+        return _Engine(pool)
+
+    def _prepare(self, sql, kwargs):
+        """Get translated SQL and positional args for given binds."""
+        if sql not in self._translated:
+            self._translated[sql] = translate(sql)
+        pg_sql, names, list_names = self._translated[sql]
+        args = [list(kwargs[name]) if name in list_names else kwargs[name]
+                for name in names]
+        return pg_sql, args
+
+    async def _run(self, method, sql, kwargs):
+        try:
+            pg_sql, args = self._prepare(sql, kwargs)
+            return await method(pg_sql, *args)
+        except Exception as e:
+            log.warning("[SQL-ERR] %s in query %s (%s)",
+                        e.__class__.__name__, sql, kwargs)
+            raise e
+
+    async def _fetch_all(self, conn, sql, **kwargs):
+        return await self._run(conn.fetch, sql, kwargs)
+
+    async def _fetch_row(self, conn, sql, **kwargs):
+        return await self._run(conn.fetchrow, sql, kwargs)
+
+    async def _query(self, conn, sql, **kwargs):
+        return await self._run(conn.execute, sql, kwargs)
+
+    async def listen(self, channel, callback):
+        """LISTEN on `channel`; calls `callback(payload)` per NOTIFY.
+
+        Holds a dedicated primary connection until cancelled or closed."""
+        async with self.primary.engine.acquire() as conn:
+            await conn.add_listener(
+                channel, lambda _conn, _pid, _channel, payload: callback(payload))
+            log.info("listening for notifications on %s", channel)
+            while not conn.is_closed():
+                await asyncio.sleep(1)
+        raise ConnectionError('LISTEN connection closed')
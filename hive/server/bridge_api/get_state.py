@@ -7,6 +7,7 @@ import ujson as json
 
 from hive.utils.normalize import legacy_amount
 from hive.server.common.mutes import Mutes
+from hive.server.common.thread import load_thread
 
 from hive.server.bridge_api.objects import (
     load_accounts,
@@ -20,6 +21,7 @@ from hive.server.condenser_api.common import (
     valid_permlink,
     valid_sort,
     valid_tag,
+    valid_thread_limits,
     get_post_id)
 from hive.server.bridge_api.tags import (
     get_trending_tags,
@@ -82,12 +84,17 @@ POST_LIST_SORTS = [
 ]
 
 @return_error_info
-async def get_state(context, path: str):
+async def get_state(context, path: str, max_depth: int = None,
+                    max_children: int = None):
     """`get_state` reimplementation.
 
     See: https://github.com/steemit/steem/blob/06e67bd4aea73391123eca99e1a22a8612b0c47e/libraries/app/database_api.cpp#L1937
+
+    Optional `max_depth` (levels below the root post) and `max_children`
+    (oldest replies kept per post) truncate huge discussion threads.
     """
     (path, part) = _normalize_path(path)
+    limits = valid_thread_limits(max_depth, max_children)
 
     db = context['db']
 
@@ -127,7 +134,7 @@ async def get_state(context, path: str):
     elif part[1] and part[1][0] == '@':
         author = valid_account(part[1][1:])
         permlink = valid_permlink(part[2])
-        state['content'] = await _load_discussion(db, author, permlink)
+        state['content'] = await _load_discussion(db, author, permlink, *limits)
         state['accounts'] = await _load_content_accounts(db, state['content'])
 
     # ranked posts - `/sort/category`
@@ -222,51 +229,23 @@ async def _load_account(db, name):
         account[key] = []
     return account
 
-async def _child_ids(db, parent_ids):
-    """Load child ids for multuple parent ids."""
-    sql = """
-             SELECT parent_id, array_agg(id)
-               FROM hive_posts
-              WHERE parent_id IN :ids
-                AND is_deleted = '0'
-           GROUP BY parent_id
-    """
-    rows = await db.query_all(sql, ids=tuple(parent_ids))
-    return [[row[0], row[1]] for row in rows]
+async def _load_discussion(db, author, permlink, max_depth=None, max_children=None):
+    """Load a full discussion thread.
 
-async def _load_discussion(db, author, permlink):
-    """Load a full discussion thread."""
+    `max_depth` and `max_children` optionally truncate huge threads."""
     root_id = await get_post_id(db, author, permlink)
-    if not root_id:
+    if not root_id or author in Mutes.all():
         return {}
 
-    # build `ids` list and `tree` map
-    ids = []
-    tree = {}
-    todo = [root_id]
-    while todo:
-        ids.extend(todo)
-        rows = await _child_ids(db, todo)
-        todo = []
-        for pid, cids in rows:
-            tree[pid] = cids
-            todo.extend(cids)
+    # build `ids` list and `tree` map; muted accounts' posts (and replies
+    # to them) are excluded by the query
+    tree, depth = await load_thread(db, root_id, max_depth, max_children,
+                                    muted=Mutes.sql_names())
+    ids = list(depth)
 
     # load all post objects, build ref-map
     posts = await load_posts_keyed(db, ids)
 
-    # remove posts/comments from muted accounts
-    muted_accounts = Mutes.all()
-    rem_pids = []
-    for pid, post in posts.items():
-        if post['author'] in muted_accounts:
-            rem_pids.append(pid)
-    for pid in rem_pids:
-        if pid in posts:
-            del posts[pid]
-        if pid in tree:
-            rem_pids.extend(tree[pid])
-
     refs = {pid: _ref(post) for pid, post in posts.items()}
 
     # add child refs to parent posts
@@ -0,0 +1,65 @@
+"""Chain state (feed price, global props) cache for server process."""
+
+import logging
+from time import perf_counter as perf
+import ujson as json
+
+from hive.utils.normalize import legacy_amount
+
+log = logging.getLogger(__name__)
+
+class ChainState:
+    """Caches objects derived from `hive_state` until its block_num changes.
+
+    Sync only refreshes `hive_state` periodically (every 20 blocks), so
+    requests just need a cheap block_num check, itself rate-limited to
+    once per `CHECK_SECS`.
+    """
+
+    CHECK_SECS = 3
+
+    _block_num = None
+    _checked = 0.0
+    _state = None
+
+    @classmethod
+    async def get(cls, db):
+        """Get a dict with `feed_price` and `props`, reloaded if stale."""
+        if cls._state and perf() - cls._checked < cls.CHECK_SECS:
+            return cls._state
+
+        num = await db.query_one("SELECT block_num FROM hive_state")
+        if not cls._state or num != cls._block_num:
+            sql = "SELECT block_num, usd_per_steem, dgpo FROM hive_state"
+            row = await db.query_row(sql)
+            cls._state = dict(feed_price=_feed_price(row['usd_per_steem']),
+                              props=_props_lite(row['dgpo']))
+            cls._block_num = row['block_num']
+        cls._checked = perf()
+        return cls._state
+
+def _feed_price(usd_per_steem):
+    """Get a steemd-style ratio object representing feed price."""
+    return {"base": "%.3f SBD" % usd_per_steem, "quote": "1.000 STEEM"}
+
+def _props_lite(dgpo):
+    """Return a minimal version of get_dynamic_global_properties data."""
+    raw = json.loads(dgpo)
+
+    # convert NAI amounts to legacy
+    nais = ['virtual_supply', 'current_supply', 'current_sbd_supply',
+            'pending_rewarded_vesting_steem', 'pending_rewarded_vesting_shares',
+            'total_vesting_fund_steem', 'total_vesting_shares']
+    for k in nais:
+        if k in raw:
+            raw[k] = legacy_amount(raw[k])
+
+    return dict(
+        time=raw['time'], #*
+        sbd_print_rate=raw['sbd_print_rate'],
+        sbd_interest_rate=raw['sbd_interest_rate'],
+        head_block_number=raw['head_block_number'], #*
+        total_vesting_shares=raw['total_vesting_shares'],
+        total_vesting_fund_steem=raw['total_vesting_fund_steem'],
+        last_irreversible_block_num=raw['last_irreversible_block_num'], #*
+    )
@@ -0,0 +1,62 @@
+"""Opaque keyset pagination cursors."""
+
+import base64
+import binascii
+from datetime import datetime
+from decimal import Decimal
+
+import ujson as json
+
+# value type tags. Float reprs round-trip the double read from the db;
+# queries must cast them back to the column's type (e.g. REAL) to seek
+# exactly to the boundary row.
+_DATE_FMT = '%Y-%m-%dT%H:%M:%S.%f'
+_ENCODERS = [
+    (bool, None),
+    (int, ('i', int)),
+    (float, ('f', repr)),
+    (Decimal, ('n', str)),
+    (datetime, ('t', lambda v: v.strftime(_DATE_FMT)))]
+_DECODERS = {
+    'i': int,
+    'f': float,
+    'n': Decimal,
+    't': lambda v: datetime.strptime(v, _DATE_FMT)}
+
+class Page(list):
+    """List of query results which also carries a cursor for each row.
+
+    Behaves as the plain result list for existing callers; `cursors`
+    maps each row's id to the token which resumes listing at that row.
+    """
+
+    def __init__(self, rows=(), cursors=None):
+        super().__init__(rows)
+        self.cursors = cursors or {}
+
+def encode(scope, value, key):
+    """Build a cursor for the row with sort `value` and unique `key`.
+
+    `scope` names the listing (e.g. sort) the cursor is valid for."""
+    for _type, enc in _ENCODERS:
+        if isinstance(value, _type):
+            break
+    else:
+        enc = None
+    assert enc, 'unsupported cursor value %r' % value
+    tag, fmt = enc
+    raw = json.dumps([scope, tag, fmt(value), int(key)])
+    return base64.urlsafe_b64encode(raw.encode('utf8')).decode('ascii').rstrip('=')
+
+def decode(token, scope):
+    """Get `(value, key)` from a cursor, asserting it belongs to `scope`."""
+    assert isinstance(token, str) and len(token) <= 256, 'invalid cursor'
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        (_scope, tag, value, key) = json.loads(raw.decode('utf8'))
+        value = _DECODERS[tag](value)
+        key = int(key)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+        raise AssertionError('invalid cursor') from e
+    assert _scope == scope, 'cursor is for `%s`, not `%s`' % (_scope, scope)
+    return (value, key)
@@ -1,15 +1,24 @@
 """List of muted accounts for server process."""
 
+import asyncio
 import logging
 from urllib.request import urlopen
 
 log = logging.getLogger(__name__)
 
 class Mutes:
-    """Singleton tracking muted accounts."""
+    """Singleton tracking muted accounts.
+
+    Loaded at startup, then refreshed in the background every
+    `REFRESH_SECS` (see `refresh_loop`).
+    """
+
+    REFRESH_SECS = 600
+    FETCH_TIMEOUT_SECS = 30
 
     _instance = None
     accounts = set()
+    names = ()
 
     @classmethod
     def instance(cls):
@@ -24,10 +33,46 @@ class Mutes:
 
     def __init__(self, url):
         """Initialize a muted account list by loading from URL"""
+        self.url = url
         if url:
-            self.accounts = set(urlopen(url).read().decode('utf8').split())
+            self._set(self._fetch())
+
+    def _fetch(self):
+        """Blocking load of muted account names from URL."""
+        with urlopen(self.url, timeout=self.FETCH_TIMEOUT_SECS) as resp:
+            return set(resp.read().decode('utf8').split())
+
+    def _set(self, accounts):
+        self.accounts = accounts
+        self.names = tuple(sorted(accounts))
+
+    async def refresh_loop(self):
+        """Reload the list periodically, keeping the last one on failure.
+
+        The fetch runs in the default executor to not block the loop."""
+        if not self.url:
+            return
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.REFRESH_SECS)
+            try:
+                accounts = await loop.run_in_executor(None, self._fetch)
+            except Exception as e:
+                log.warning("muted accounts refresh failed: %s", repr(e))
+                continue
+            if accounts != self.accounts:
+                log.info("muted accounts: %d -> %d",
+                         len(self.accounts), len(accounts))
+                self._set(accounts)
 
     @classmethod
     def all(cls):
         """Return the set of all muted accounts from singleton instance."""
         return cls.instance().accounts
+
+    @classmethod
+    def sql_names(cls):
+        """Get muted accounts as a sorted tuple, for `NOT IN :muted` binds.
+
+        Empty if there are none; callers must skip the filter then."""
+        return cls.instance().names
@@ -0,0 +1,76 @@
+"""Cache of pre-serialized post objects for server process."""
+
+import logging
+from collections import OrderedDict
+import ujson as json
+
+log = logging.getLogger(__name__)
+
+class PostCache:
+    """LRU of serialized post objects, keyed by post id and version.
+
+    Post objects are built once per version and stored as compact JSON
+    fragments. Each read returns a fresh copy (via `json.loads`), so
+    callers may freely apply per-request post-processing such as body
+    truncation, vote muting or reblog info.
+    """
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """Get the shared instance."""
+        assert cls._instance, 'set_shared_instance was never called'
+        return cls._instance
+
+    @classmethod
+    def set_shared_instance(cls, instance):
+        """Set the global/shared instance."""
+        cls._instance = instance
+
+    def __init__(self, max_size=20000):
+        assert max_size > 0, 'post cache size must be positive'
+        self._max_size = max_size
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._miss = 0
+
+    def get(self, post_id, version):
+        """Get a copy of a cached post object, if version is current.
+
+        Tracks hit rate."""
+        entry = self._items.get(post_id)
+        if not entry or entry[0] != version:
+            self._miss += 1
+            return None
+        self._hits += 1
+        self._items.move_to_end(post_id)
+        return json.loads(entry[1])
+
+    def put(self, post_id, version, post):
+        """Store a serialized post object, evicting the oldest if full."""
+        if post_id in self._items:
+            self._remove(post_id)
+        elif len(self._items) >= self._max_size:
+            self._remove(next(iter(self._items)))
+        fragment = json.dumps(post)
+        self._items[post_id] = (version, fragment)
+        self._bytes += len(fragment)
+
+    def _remove(self, post_id):
+        _, fragment = self._items.pop(post_id)
+        self._bytes -= len(fragment)
+
+    def stats(self):
+        """Get entry count, serialized size and hit rate."""
+        total = self._hits + self._miss
+        return dict(entries=len(self._items),
+                    max_entries=self._max_size,
+                    fragment_mb=round(self._bytes / (1024 * 1024), 1),
+                    hits=self._hits,
+                    misses=self._miss,
+                    hit_rate=round(self._hits / total, 3) if total else None)
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,117 @@
+"""Block-scoped cache of API responses for server process."""
+
+import asyncio
+import logging
+from collections import ChainMap
+from functools import wraps
+
+from hive.server.common.single_flight import request_key
+
+log = logging.getLogger(__name__)
+
+# must match channel used by indexer (see `Blocks.notify_head`)
+BLOCK_CHANNEL = 'hive_block'
+
+def cacheable(function):
+    """Async API method decorator which serves results from block cache.
+
+    Results are keyed by method and params, and are only considered
+    fresh until the indexer reports a new head block. Results are
+    loaded from the primary, as replicas may lag behind that block.
+    """
+    @wraps(function)
+    async def wrapper(context, *args, **kwargs):
+        """Look up cache in app context; bypass if not configured."""
+        cache = context.get('response_cache')
+        if not cache:
+            return await function(context, *args, **kwargs)
+        primary = ChainMap({'db': context['db'].primary_reads()}, context)
+        return await cache.get_or_load(
+            request_key(function, args, kwargs),
+            lambda: function(primary, *args, **kwargs))
+    return wrapper
+
+class ResponseCache:
+    """Caches API results until the next block is committed.
+
+    Sync process NOTIFYs a channel with the head block number after
+    each block. Entries from the previous block are retained as stale;
+    if refreshing takes longer than `stale_secs`, the stale result is
+    served while the refresh completes in the background.
+    """
+
+    def __init__(self, max_size=10000, stale_secs=0.25):
+        self._max_size = max_size
+        self._stale_secs = stale_secs
+        self._block = None
+        self._items = {}      # key -> (block_num, result)
+        self._loading = {}    # (key, block_num) -> refresh task in flight
+        self._hits = 0
+        self._stale = 0
+        self._miss = 0
+
+    def new_block(self, num):
+        """Mark all entries stale; drop any older than previous block.
+
+        Passing `None` disables caching (e.g. lost LISTEN connection).
+        """
+        prev = self._block
+        self._block = int(num) if num is not None else None
+        if self._block is None:
+            self._items = {}
+            return
+        self._items = {key: entry for key, entry in self._items.items()
+                       if entry[0] == prev}
+
+    async def get_or_load(self, key, loader):
+        """Return cached result for `key`, or load it via `loader()`."""
+        if self._block is None:
+            self._miss += 1
+            return await loader()
+
+        entry = self._items.get(key)
+        if entry and entry[0] == self._block:
+            self._hits += 1
+            return entry[1]
+
+        # join refresh in flight for this block, if any
+        task_key = (key, self._block)
+        task = self._loading.get(task_key)
+        if not task:
+            task = asyncio.ensure_future(self._load(task_key, loader))
+            self._loading[task_key] = task
+
+        if not entry:
+            self._miss += 1
+            return await asyncio.shield(task)
+
+        # stale-while-revalidate: give refresh a moment, else serve stale
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), self._stale_secs)
+            self._miss += 1
+            return result
+        except asyncio.TimeoutError:
+            self._stale += 1
+            return entry[1]
+
+    async def _load(self, task_key, loader):
+        key, block_num = task_key
+        try:
+            result = await loader()
+            if len(self._items) >= self._max_size:
+                self._items = {}
+            self._items[key] = (block_num, result)
+            return result
+        finally:
+            del self._loading[task_key]
+
+    def stats(self):
+        """Get entry count and hit/stale/miss counters."""
+        total = self._hits + self._stale + self._miss
+        return dict(block_num=self._block,
+                    entries=len(self._items),
+                    hits=self._hits,
+                    stale_hits=self._stale,
+                    misses=self._miss,
+                    hit_rate=(round((self._hits + self._stale) / total, 3)
+                              if total else None))
@@ -0,0 +1,61 @@
+"""Request coalescing for server process."""
+
+import asyncio
+import logging
+from functools import wraps
+import ujson as json
+
+log = logging.getLogger(__name__)
+
+def request_key(function, args, kwargs):
+    """Normalized key for an API method call: name + params."""
+    return (function.__module__ + '.' + function.__name__
+            + json.dumps([args, kwargs], sort_keys=True))
+
+def coalesced(function):
+    """Async API method decorator which shares identical calls in flight.
+
+    Concurrent calls with the same method and params await a single
+    execution. Nothing is retained once the call completes.
+    """
+    @wraps(function)
+    async def wrapper(context, *args, **kwargs):
+        """Look up in-flight registry in app context; bypass if absent."""
+        flight = context.get('single_flight')
+        if not flight:
+            return await function(context, *args, **kwargs)
+        return await flight.run(request_key(function, args, kwargs),
+                                lambda: function(context, *args, **kwargs))
+    return wrapper
+
+class SingleFlight:
+    """Registry of in-flight calls, keyed by normalized request."""
+
+    def __init__(self):
+        self._pending = {}
+        self._calls = 0
+        self._shared = 0
+
+    async def run(self, key, loader):
+        """Await `loader()`, or join an identical call already running."""
+        self._calls += 1
+        task = self._pending.get(key)
+        if task:
+            self._shared += 1
+        else:
+            task = asyncio.ensure_future(self._run(key, loader))
+            self._pending[key] = task
+        # shield: one caller going away must not cancel the others
+        return await asyncio.shield(task)
+
+    async def _run(self, key, loader):
+        try:
+            return await loader()
+        finally:
+            del self._pending[key]
+
+    def stats(self):
+        """Get call counts and number of calls served by a shared run."""
+        return dict(in_flight=len(self._pending),
+                    calls=self._calls,
+                    coalesced=self._shared)
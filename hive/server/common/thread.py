@@ -0,0 +1,57 @@
+"""Loading of discussion (reply tree) skeletons."""
+
+from collections import deque
+
+async def load_thread(db, post_id, max_depth=None, max_children=None,
+                      muted=(), valid_only=False):
+    """Load the reply tree below `post_id` with a single query.
+
+    All posts in a thread share `root_id`, so the whole thread is read
+    with one index scan and assembled here. Deleted posts (and their
+    replies) are excluded.
+
+    Returns `(tree, depth)`: `tree` maps post id to its ordered child
+    ids (only for posts with children); `depth` maps each reachable id
+    to its level below `post_id`, in breadth-first order.
+
+    `max_depth` limits levels loaded below `post_id`; `max_children`
+    keeps only the first (oldest) n replies of each post.
+    """
+    filt = ''
+    if max_depth is not None:
+        filt += " AND depth <= (SELECT depth FROM hive_posts WHERE id = :id) + :max_depth"
+    if valid_only:
+        filt += " AND is_muted = '0' AND is_valid = '1'"
+    if muted:
+        filt += " AND author NOT IN :muted"
+
+    sql = """
+        SELECT id, parent_id
+          FROM hive_posts
+         WHERE root_id = (SELECT root_id FROM hive_posts WHERE id = :id)
+           AND depth >= (SELECT depth FROM hive_posts WHERE id = :id)
+           AND is_deleted = '0' %s
+      ORDER BY id
+    """ % filt
+
+    children = {}
+    for row in await db.query_all(sql, id=post_id, max_depth=max_depth,
+                                  muted=tuple(muted)):
+        children.setdefault(row['parent_id'], []).append(row['id'])
+
+    tree = {}
+    depth = {post_id: 0}
+    todo = deque([post_id])
+    while todo:
+        pid = todo.popleft()
+        cids = children.get(pid)
+        if not cids:
+            continue
+        if max_children:
+            cids = cids[:max_children]
+        tree[pid] = cids
+        for cid in cids:
+            depth[cid] = depth[pid] + 1
+        todo.extend(cids)
+
+    return (tree, depth)
@@ -104,7 +104,7 @@ async def call(context, api, method, params):
 
     # Content monolith
     elif method == 'get_state':
-        return await get_state(context, *_strict_list(params, 1))
+        return await get_state(context, *_strict_list(params, 3, 1))
 
     # Global discussion queries
     elif method == 'get_discussions_by_trending':
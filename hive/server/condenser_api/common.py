@@ -72,6 +72,15 @@ def valid_limit(limit, ubound=100):
     assert limit <= ubound, "limit exceeds max (%d > %d)" % (limit, ubound)
     return limit
 
+def valid_thread_limits(max_depth, max_children):
+    """Validate optional discussion truncation limits (None: unlimited)."""
+    if max_depth is not None:
+        max_depth = int(max_depth)
+        assert 0 <= max_depth <= 255, "max_depth must be 0 to 255"
+    if max_children is not None:
+        max_children = valid_limit(max_children, ubound=1000)
+    return (max_depth, max_children)
+
 def valid_offset(offset, ubound=None):
     """Given a user-provided offset, return a valid int, or raise."""
     offset = int(offset)
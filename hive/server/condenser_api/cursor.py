@@ -4,6 +4,7 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
 from hive.utils.normalize import rep_to_raw
+from hive.server.common.keyset import Page, decode, encode
 
 def last_month():
     """Get the date 1 month ago."""
@@ -21,57 +22,77 @@ async def _get_account_id(db, name):
     assert _id, "account not found: `%s`" % name
     return _id
 
+def _page(scope, rows):
+    """Build a Page of `row[0]`s from `(item, sort value, key)` rows."""
+    return Page([row[0] for row in rows],
+                {row[0]: encode(scope, row[1], row[2]) for row in rows})
 
-async def get_followers(db, account: str, start: str, follow_type: str, limit: int):
-    """Get a list of accounts following a given account."""
+async def get_followers(db, account: str, start: str, follow_type: str, limit: int,
+                        start_cursor: str = None):
+    """Get a list of accounts following a given account.
+
+    Resumes at `start_cursor` if given, otherwise at account `start`."""
     account_id = await _get_account_id(db, account)
-    start_id = await _get_account_id(db, start) if start else None
     state = 2 if follow_type == 'ignore' else 1
 
     seek = ''
-    if start_id:
-        seek = """AND hf.created_at <= (
-                     SELECT created_at FROM hive_follows
+    start_value = start_id = None
+    if start_cursor:
+        start_value, start_id = decode(start_cursor, 'followers')
+        seek = "AND (hf.created_at, hf.follower) <= (:start_value, :start_id)"
+    elif start:
+        start_id = await _get_account_id(db, start)
+        seek = """AND (hf.created_at, hf.follower) <= (
+                     SELECT created_at, follower FROM hive_follows
                       WHERE following = :account_id
                         AND follower = :start_id)"""
 
     sql = """
-        SELECT name FROM hive_follows hf
+        SELECT name, hf.created_at, hf.follower FROM hive_follows hf
      LEFT JOIN hive_accounts ON hf.follower = id
          WHERE hf.following = :account_id
            AND state = :state %s
-      ORDER BY hf.created_at DESC
+      ORDER BY hf.created_at DESC, hf.follower DESC
          LIMIT :limit
     """ % seek
 
-    return await db.query_col(sql, account_id=account_id, start_id=start_id,
-                              state=state, limit=limit)
+    rows = await db.query_all(sql, account_id=account_id, state=state, limit=limit,
+                              start_value=start_value, start_id=start_id)
+    return _page('followers', rows)
+
 
+async def get_following(db, account: str, start: str, follow_type: str, limit: int,
+                        start_cursor: str = None):
+    """Get a list of accounts followed by a given account.
 
-async def get_following(db, account: str, start: str, follow_type: str, limit: int):
-    """Get a list of accounts followed by a given account."""
+    Resumes at `start_cursor` if given, otherwise at account `start`."""
     account_id = await _get_account_id(db, account)
-    start_id = await _get_account_id(db, start) if start else None
     state = 2 if follow_type == 'ignore' else 1
 
     seek = ''
-    if start_id:
-        seek = """AND hf.created_at <= (
-                     SELECT created_at FROM hive_follows
+    start_value = start_id = None
+    if start_cursor:
+        start_value, start_id = decode(start_cursor, 'following')
+        seek = "AND (hf.created_at, hf.following) <= (:start_value, :start_id)"
+    elif start:
+        start_id = await _get_account_id(db, start)
+        seek = """AND (hf.created_at, hf.following) <= (
+                     SELECT created_at, following FROM hive_follows
                       WHERE follower = :account_id
                         AND following = :start_id)"""
 
     sql = """
-        SELECT name FROM hive_follows hf
+        SELECT name, hf.created_at, hf.following FROM hive_follows hf
      LEFT JOIN hive_accounts ON hf.following = id
          WHERE hf.follower = :account_id
            AND state = :state %s
-      ORDER BY hf.created_at DESC
+      ORDER BY hf.created_at DESC, hf.following DESC
          LIMIT :limit
     """ % seek
 
-    return await db.query_col(sql, account_id=account_id, start_id=start_id,
-                              state=state, limit=limit)
+    rows = await db.query_all(sql, account_id=account_id, state=state, limit=limit,
+                              start_value=start_value, start_id=start_id)
+    return _page('following', rows)
 
 
 async def get_follow_counts(db, account: str):
@@ -109,10 +130,12 @@ async def get_account_reputations(db, account_lower_bound, limit):
     return [dict(name=r[0], reputation=rep_to_raw(r[1])) for r in rows]
 
 
-async def pids_by_query(db, sort, start_author, start_permlink, limit, tag):
+async def pids_by_query(db, sort, start_author, start_permlink, limit, tag,
+                        start_cursor=None):
     """Get a list of post_ids for a given posts query.
 
     `sort` can be trending, hot, created, promoted, payout, or payout_comments.
+    Resumes at `start_cursor` if given, otherwise at the start post.
     """
     assert sort in ['trending', 'hot', 'created', 'promoted',
                     'payout', 'payout_comments']
@@ -143,57 +166,83 @@ async def pids_by_query(db, sort, start_author, start_permlink, limit, tag):
         where.append("is_paidout = '0'")
         where.append('depth > 0')
 
-    if tag:
+    # ranked table holds scores of unpaid, tagged root posts
+    ranked = tag and sort in ['trending', 'hot', 'promoted']
+    if ranked:
+        table = 'hive_tag_ranks'
+        where = ['tag = :tag'] + (['promoted > 0'] if sort == 'promoted' else [])
+    elif tag:
         if sort in ['payout', 'payout_comments']:
             where.append('category = :tag')
         else:
             sql = "SELECT post_id FROM hive_post_tags WHERE tag = :tag"
             where.append("post_id IN (%s)" % sql)
 
-    start_id = None
-    if start_permlink:
+    # keyset is (field, post_id); `created` is keyed by post_id alone
+    keys = 'post_id' if field == 'post_id' else field + ', post_id'
+
+    start_value = start_id = None
+    if start_cursor:
+        start_value, start_id = decode(start_cursor, sort)
+        value = ':start_value'
+        if field in ('sc_trend', 'sc_hot'):
+            # compare as REAL; widening the column to float8 instead
+            # would not match the row the cursor was taken from
+            value = 'CAST(:start_value AS REAL)'
+        where.append("(%s) <= (%s)" % (keys, ':start_id' if field == 'post_id'
+                                       else value + ', :start_id'))
+    elif start_permlink:
         start_id = await _get_post_id(db, start_author, start_permlink)
         if not start_id:
             return []
 
-        sql = "%s <= (SELECT %s FROM %s WHERE post_id = :start_id)"
-        where.append(sql % (field, field, table))
+        sql = "(%s) <= (SELECT %s FROM hive_posts_cache WHERE post_id = :start_id)"
+        where.append(sql % (keys, keys))
 
-    sql = ("SELECT post_id FROM %s WHERE %s ORDER BY %s DESC LIMIT :limit"
-           % (table, ' AND '.join(where), field))
+    sql = ("SELECT post_id, %s FROM %s WHERE %s ORDER BY %s LIMIT :limit"
+           % (field, table, ' AND '.join(where),
+              ', '.join(k + ' DESC' for k in keys.split(', '))))
 
-    return await db.query_col(sql, tag=tag, start_id=start_id, limit=limit)
+    rows = await db.query_all(sql, tag=tag, start_value=start_value,
+                              start_id=start_id, limit=limit)
+    return _page(sort, [(r[0], r[1], r[0]) for r in rows])
 
 
 async def pids_by_blog(db, account: str, start_author: str = '',
-                       start_permlink: str = '', limit: int = 20):
+                       start_permlink: str = '', limit: int = 20,
+                       start_cursor: str = None):
     """Get a list of post_ids for an author's blog."""
     account_id = await _get_account_id(db, account)
 
     seek = ''
-    start_id = None
-    if start_permlink:
+    start_value = start_id = None
+    if start_cursor:
+        start_value, start_id = decode(start_cursor, 'blog')
+        seek = "AND (created_at, post_id) <= (:start_value, :start_id)"
+    elif start_permlink:
         start_id = await _get_post_id(db, start_author, start_permlink)
         if not start_id:
             return []
 
         seek = """
-          AND created_at <= (
-            SELECT created_at
+          AND (created_at, post_id) <= (
+            SELECT created_at, post_id
               FROM hive_feed_cache
              WHERE account_id = :account_id
                AND post_id = :start_id)
         """
 
     sql = """
-        SELECT post_id
+        SELECT post_id, created_at
           FROM hive_feed_cache
          WHERE account_id = :account_id %s
-      ORDER BY created_at DESC
+      ORDER BY created_at DESC, post_id DESC
          LIMIT :limit
     """ % seek
 
-    return await db.query_col(sql, account_id=account_id, start_id=start_id, limit=limit)
+    rows = await db.query_all(sql, account_id=account_id, start_value=start_value,
+                              start_id=start_id, limit=limit)
+    return _page('blog', [(r[0], r[1], r[0]) for r in rows])
 
 
 async def pids_by_blog_by_index(db, account: str, start_index: int, limit: int = 20):
@@ -210,35 +259,40 @@ async def pids_by_blog_by_index(db, account: str, start_index: int, limit: int =
     account_id = await _get_account_id(db, account)
 
     if start_index == -1 or start_index == 0:
-        sql = """SELECT COUNT(*) - 1 FROM hive_feed_cache
+        sql = """SELECT MAX(idx) FROM hive_feed_cache
                   WHERE account_id = :account_id"""
         start_index = await db.query_one(sql, account_id=account_id)
-        if start_index < 0:
+        if start_index is None:
             return (0, [])
 
     offset = start_index - limit + 1
     assert offset >= 0, ('start_index and limit combination is invalid (%d, %d)'
                          % (start_index, limit))
 
+    # entries are densely numbered per account (see FeedCache)
     sql = """
         SELECT post_id
           FROM hive_feed_cache
          WHERE account_id = :account_id
-      ORDER BY created_at
-         LIMIT :limit
-        OFFSET :offset
+           AND idx BETWEEN :offset AND :start_index
+      ORDER BY idx DESC
     """
 
-    ids = await db.query_col(sql, account_id=account_id, limit=limit, offset=offset)
-    return (start_index, list(reversed(ids)))
+    ids = await db.query_col(sql, account_id=account_id, offset=offset,
+                             start_index=start_index)
+    return (start_index, ids)
 
 
-async def pids_by_blog_without_reblog(db, account: str, start_permlink: str = '', limit: int = 20):
+async def pids_by_blog_without_reblog(db, account: str, start_permlink: str = '',
+                                      limit: int = 20, start_cursor: str = None):
     """Get a list of post_ids for an author's blog without reblogs."""
 
     seek = ''
     start_id = None
-    if start_permlink:
+    if start_cursor:
+        _, start_id = decode(start_cursor, 'posts')
+        seek = "AND id <= :start_id"
+    elif start_permlink:
         start_id = await _get_post_id(db, account, start_permlink)
         if not start_id:
             return []
@@ -254,49 +308,95 @@ async def pids_by_blog_without_reblog(db, account: str, start_permlink: str = ''
          LIMIT :limit
     """ % seek
 
-    return await db.query_col(sql, account=account, start_id=start_id, limit=limit)
+    ids = await db.query_col(sql, account=account, start_id=start_id, limit=limit)
+    return _page('posts', [(_id, _id, _id) for _id in ids])
 
 
 async def pids_by_feed_with_reblog(db, account: str, start_author: str = '',
-                                   start_permlink: str = '', limit: int = 20):
-    """Get a list of [post_id, reblogged_by_str] for an account's feed."""
+                                   start_permlink: str = '', limit: int = 20,
+                                   start_cursor: str = None):
+    """Get a list of [post_id, reblogged_by_str] for an account's feed.
+
+    Reads the account's materialized feed (`hive_feeds`), merged with
+    entries of followed accounts too large to fan out. Pages reaching
+    past the materialized horizon fall back to the full feed query.
+    Page cursors are keyed by `(MIN(created_at), post_id)`: the time
+    the post first entered the feed, then its id."""
     account_id = await _get_account_id(db, account)
 
     seek = ''
-    start_id = None
-    if start_permlink:
+    start_value = start_id = None
+    if start_cursor:
+        start_value, start_id = decode(start_cursor, 'feed')
+        seek = """
+          HAVING (MIN(f.created_at), post_id) <= (:start_value, :start_id)
+        """
+    elif start_permlink:
         start_id = await _get_post_id(db, start_author, start_permlink)
         if not start_id:
             return []
 
         seek = """
-          HAVING MIN(hive_feed_cache.created_at) <= (
+          HAVING (MIN(f.created_at), post_id) <= ((
             SELECT MIN(created_at) FROM hive_feed_cache WHERE post_id = :start_id
                AND account_id IN (SELECT following FROM hive_follows
-                                  WHERE follower = :account AND state = 1))
+                                  WHERE follower = :account AND state = 1)), :start_id)
         """
 
+    args = dict(account=account_id, start_value=start_value, start_id=start_id,
+                limit=limit, cutoff=last_month())
+
     sql = """
-        SELECT post_id, string_agg(name, ',') accounts
-          FROM hive_feed_cache
-          JOIN hive_follows ON account_id = hive_follows.following AND state = 1
-          JOIN hive_accounts ON hive_follows.following = hive_accounts.id
-         WHERE hive_follows.follower = :account
-           AND hive_feed_cache.created_at > :cutoff
+        WITH horizon AS (
+            SELECT GREATEST(:cutoff, MIN(created_at)) AS created_at
+              FROM hive_feeds WHERE account_id = :account)
+        SELECT post_id, string_agg(name, ',') accounts,
+               MIN(f.created_at) created_at
+          FROM (SELECT post_id, source_id, created_at
+                  FROM hive_feeds
+                 WHERE account_id = :account
+                   AND created_at >= (SELECT created_at FROM horizon)
+             UNION ALL
+                SELECT fc.post_id, fc.account_id, fc.created_at
+                  FROM hive_follows hf
+                  JOIN hive_accounts ha ON ha.id = hf.following
+                  JOIN hive_feed_cache fc ON fc.account_id = hf.following
+                 WHERE hf.follower = :account AND hf.state = 1
+                   AND NOT ha.fanout
+                   AND fc.created_at >= (SELECT created_at FROM horizon)) f
+          JOIN hive_accounts ON f.source_id = hive_accounts.id
       GROUP BY post_id %s
-      ORDER BY MIN(hive_feed_cache.created_at) DESC LIMIT :limit
+      ORDER BY MIN(f.created_at) DESC, post_id DESC LIMIT :limit
     """ % seek
+    result = await db.query_all(sql, **args)
 
-    result = await db.query_all(sql, account=account_id, start_id=start_id,
-                                limit=limit, cutoff=last_month())
-    return [(row[0], row[1]) for row in result]
-
-
-async def pids_by_account_comments(db, account: str, start_permlink: str = '', limit: int = 20):
+    if len(result) < limit:
+        sql = """
+            SELECT post_id, string_agg(name, ',') accounts,
+                   MIN(f.created_at) created_at
+              FROM hive_feed_cache f
+              JOIN hive_follows ON account_id = hive_follows.following AND state = 1
+              JOIN hive_accounts ON hive_follows.following = hive_accounts.id
+             WHERE hive_follows.follower = :account
+               AND f.created_at > :cutoff
+          GROUP BY post_id %s
+          ORDER BY MIN(f.created_at) DESC, post_id DESC LIMIT :limit
+        """ % seek
+        result = await db.query_all(sql, **args)
+
+    return Page([(row[0], row[1]) for row in result],
+                {row[0]: encode('feed', row[2], row[0]) for row in result})
+
+
+async def pids_by_account_comments(db, account: str, start_permlink: str = '',
+                                   limit: int = 20, start_cursor: str = None):
     """Get a list of post_ids representing comments by an author."""
     seek = ''
     start_id = None
-    if start_permlink:
+    if start_cursor:
+        _, start_id = decode(start_cursor, 'comments')
+        seek = "AND id <= :start_id"
+    elif start_permlink:
         start_id = await _get_post_id(db, account, start_permlink)
         if not start_id:
             return []
@@ -313,19 +413,26 @@ async def pids_by_account_comments(db, account: str, start_permlink: str = '', l
          LIMIT :limit
     """ % seek
 
-    return await db.query_col(sql, account=account, start_id=start_id, limit=limit)
+    ids = await db.query_col(sql, account=account, start_id=start_id, limit=limit)
+    return _page('comments', [(_id, _id, _id) for _id in ids])
 
 
-async def pids_by_replies_to_account(db, start_author: str, start_permlink: str = '', limit: int = 20):
+async def pids_by_replies_to_account(db, start_author: str, start_permlink: str = '',
+                                     limit: int = 20, start_cursor: str = None):
     """Get a list of post_ids representing replies to an author.
 
     To get the first page of results, specify `start_author` as the
     account being replied to. For successive pages, provide the
-    last loaded reply's author/permlink.
+    last loaded reply's author/permlink -- or keep `start_author` and
+    pass the reply's `start_cursor`.
     """
     seek = ''
     start_id = None
-    if start_permlink:
+    if start_cursor:
+        _, start_id = decode(start_cursor, 'replies')
+        parent_account = start_author
+        seek = "AND id <= :start_id"
+    elif start_permlink:
         sql = """
           SELECT parent.author,
                  child.id
@@ -358,4 +465,5 @@ async def pids_by_replies_to_account(db, start_author: str, start_permlink: str
         LIMIT :limit
     """ % seek
 
-    return await db.query_col(sql, parent=parent_account, start_id=start_id, limit=limit)
+    ids = await db.query_col(sql, parent=parent_account, start_id=start_id, limit=limit)
+    return _page('replies', [(_id, _id, _id) for _id in ids])
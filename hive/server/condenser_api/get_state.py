@@ -1,13 +1,13 @@
 """Routes then builds a get_state response object"""
 
 #pylint: disable=line-too-long,too-many-lines
+import asyncio
 import logging
 from collections import OrderedDict
-import ujson as json
-from aiocache import cached
 
-from hive.utils.normalize import legacy_amount
 from hive.server.common.mutes import Mutes
+from hive.server.common.thread import load_thread
+from hive.server.common.chain_state import ChainState
 
 from hive.server.condenser_api.objects import (
     load_accounts,
@@ -21,10 +21,11 @@ from hive.server.condenser_api.common import (
     valid_permlink,
     valid_sort,
     valid_tag,
+    valid_thread_limits,
     get_post_id)
 from hive.server.condenser_api.tags import (
-    get_trending_tags,
-    get_top_trending_tags_summary)
+    trending_tags,
+    top_trending_tags_summary)
 
 import hive.server.condenser_api.cursor as cursor
 
@@ -83,24 +84,47 @@ POST_LIST_SORTS = [
 ]
 
 @return_error_info
-async def get_state(context, path: str):
+async def get_state(context, path: str, max_depth: int = None,
+                    max_children: int = None):
     """`get_state` reimplementation.
 
     See: https://github.com/steemit/steem/blob/06e67bd4aea73391123eca99e1a22a8612b0c47e/libraries/app/database_api.cpp#L1937
+
+    Optional `max_depth` (levels below the root post) and `max_children`
+    (oldest replies kept per post) truncate huge discussion threads.
     """
     (path, part) = _normalize_path(path)
-
-    db = context['db']
+    limits = valid_thread_limits(max_depth, max_children)
 
     state = {
-        'feed_price': await _get_feed_price(db),
-        'props': await _get_props_lite(db),
+        'feed_price': None,
+        'props': None,
         'tags': {},
         'accounts': {},
         'content': {},
         'tag_idx': {'trending': []},
         'discussion_idx': {"": {}}}
 
+    # independent loads run concurrently, each on its own session, so a
+    # request holds at most three pooled connections. Sessions connect
+    # on first query; chain state is usually served from memory.
+    db = context['db']
+    async with db.session() as main, db.session() as aux, db.session() as props:
+        chain, _ = await _gather(
+            ChainState.get(props),
+            _load_path_state(main, aux, state, path, part, limits))
+    state['feed_price'] = chain['feed_price']
+    state['props'] = chain['props']
+
+    return state
+
+async def _load_path_state(db, aux, state, path, part, limits):
+    """Populate `state` for a get_state path, using session `db`.
+
+    Loads independent of the main sequence run concurrently on session
+    `aux`. `limits` are `(max_depth, max_children)` for discussion
+    threads."""
+
     # account - `/@account/tab` (feed, blog, comments, replies)
     if part[0] and part[0][0] == '@':
         assert not part[1] == 'transfers', 'transfers API not served here'
@@ -110,25 +134,27 @@ async def get_state(context, path: str):
             part[1] = 'blog'
 
         account = valid_account(part[0][1:])
-        state['accounts'][account] = await _load_account(db, account)
 
         if part[1] in ACCOUNT_TAB_KEYS:
             key = ACCOUNT_TAB_KEYS[part[1]]
-            posts = await _get_account_discussion_by_key(db, account, key)
+            acct, posts = await _gather(
+                _load_account(aux, account),
+                _get_account_discussion_by_key(db, account, key))
+            state['accounts'][account] = acct
             state['content'] = _keyed_posts(posts)
-            state['accounts'][account][key] = list(state['content'].keys())
-        elif part[1] in ACCOUNT_TAB_IGNORE:
-            pass # condenser no-op URLs
+            acct[key] = list(state['content'].keys())
         else:
-            # invalid/undefined case; probably requesting `@user/permlink`,
-            # but condenser still relies on a valid response for redirect.
-            state['error'] = 'invalid get_state account path %s' % path
+            state['accounts'][account] = await _load_account(db, account)
+            if part[1] not in ACCOUNT_TAB_IGNORE: # condenser no-op URLs
+                # invalid/undefined case; probably requesting `@user/permlink`,
+                # but condenser still relies on a valid response for redirect.
+                state['error'] = 'invalid get_state account path %s' % path
 
     # discussion - `/category/@account/permlink`
     elif part[1] and part[1][0] == '@':
         author = valid_account(part[1][1:])
         permlink = valid_permlink(part[2])
-        state['content'] = await _load_discussion(db, author, permlink)
+        state['content'] = await _load_discussion(db, author, permlink, *limits)
         state['accounts'] = await _load_content_accounts(db, state['content'])
 
     # ranked posts - `/sort/category`
@@ -136,15 +162,17 @@ async def get_state(context, path: str):
         assert not part[2], "unexpected discussion path part[2] %s" % path
         sort = valid_sort(part[0])
         tag = valid_tag(part[1].lower(), allow_empty=True)
-        pids = await cursor.pids_by_query(db, sort, '', '', 20, tag)
-        state['content'] = _keyed_posts(await load_posts(db, pids))
+        posts, trending = await _gather(
+            _load_ranked_posts(db, sort, tag),
+            top_trending_tags_summary(aux))
+        state['content'] = _keyed_posts(posts)
         state['discussion_idx'] = {tag: {sort: list(state['content'].keys())}}
-        state['tag_idx'] = {'trending': await get_top_trending_tags_summary(context)}
+        state['tag_idx'] = {'trending': trending}
 
     # tag "explorer" - `/tags`
     elif part[0] == "tags":
         assert not part[1] and not part[2], 'invalid /tags request'
-        for tag in await get_trending_tags(context):
+        for tag in await trending_tags(db):
             state['tag_idx']['trending'].append(tag['name'])
             state['tags'][tag['name']] = tag
 
@@ -154,7 +182,18 @@ async def get_state(context, path: str):
     else:
         raise ApiError('unhandled path: /%s' % path)
 
-    return state
+async def _gather(*loads):
+    """Like `asyncio.gather`, but on error waits for every load before
+    raising, so none is left running on a session being released."""
+    results = await asyncio.gather(*loads, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return results
+
+async def _load_ranked_posts(db, sort, tag):
+    pids = await cursor.pids_by_query(db, sort, '', '', 20, tag)
+    return await load_posts(db, pids)
 
 async def _get_account_discussion_by_key(db, account, key):
     assert account, 'account must be specified'
@@ -223,51 +262,23 @@ async def _load_account(db, name):
         account[key] = []
     return account
 
-async def _child_ids(db, parent_ids):
-    """Load child ids for multuple parent ids."""
-    sql = """
-             SELECT parent_id, array_agg(id)
-               FROM hive_posts
-              WHERE parent_id IN :ids
-                AND is_deleted = '0'
-           GROUP BY parent_id
-    """
-    rows = await db.query_all(sql, ids=tuple(parent_ids))
-    return [[row[0], row[1]] for row in rows]
+async def _load_discussion(db, author, permlink, max_depth=None, max_children=None):
+    """Load a full discussion thread.
 
-async def _load_discussion(db, author, permlink):
-    """Load a full discussion thread."""
+    `max_depth` and `max_children` optionally truncate huge threads."""
     root_id = await get_post_id(db, author, permlink)
-    if not root_id:
+    if not root_id or author in Mutes.all():
         return {}
 
-    # build `ids` list and `tree` map
-    ids = []
-    tree = {}
-    todo = [root_id]
-    while todo:
-        ids.extend(todo)
-        rows = await _child_ids(db, todo)
-        todo = []
-        for pid, cids in rows:
-            tree[pid] = cids
-            todo.extend(cids)
+    # build `ids` list and `tree` map; muted accounts' posts (and replies
+    # to them) are excluded by the query
+    tree, depth = await load_thread(db, root_id, max_depth, max_children,
+                                    muted=Mutes.sql_names())
+    ids = list(depth)
 
     # load all post objects, build ref-map
     posts = await load_posts_keyed(db, ids)
 
-    # remove posts/comments from muted accounts
-    muted_accounts = Mutes.all()
-    rem_pids = []
-    for pid, post in posts.items():
-        if post['author'] in muted_accounts:
-            rem_pids.append(pid)
-    for pid in rem_pids:
-        if pid in posts:
-            del posts[pid]
-        if pid in tree:
-            rem_pids.extend(tree[pid])
-
     refs = {pid: _ref(post) for pid, post in posts.items()}
 
     # add child refs to parent posts
@@ -278,32 +289,3 @@ async def _load_discussion(db, author, permlink):
 
     # return all nodes keyed by ref
     return {refs[pid]: post for pid, post in posts.items()}
-
-@cached(ttl=1800, timeout=1200)
-async def _get_feed_price(db):
-    """Get a steemd-style ratio object representing feed price."""
-    price = await db.query_one("SELECT usd_per_steem FROM hive_state")
-    return {"base": "%.3f SBD" % price, "quote": "1.000 STEEM"}
-
-@cached(ttl=1800, timeout=1200)
-async def _get_props_lite(db):
-    """Return a minimal version of get_dynamic_global_properties data."""
-    raw = json.loads(await db.query_one("SELECT dgpo FROM hive_state"))
-
-    # convert NAI amounts to legacy
-    nais = ['virtual_supply', 'current_supply', 'current_sbd_supply',
-            'pending_rewarded_vesting_steem', 'pending_rewarded_vesting_shares',
-            'total_vesting_fund_steem', 'total_vesting_shares']
-    for k in nais:
-        if k in raw:
-            raw[k] = legacy_amount(raw[k])
-
-    return dict(
-        time=raw['time'], #*
-        sbd_print_rate=raw['sbd_print_rate'],
-        sbd_interest_rate=raw['sbd_interest_rate'],
-        head_block_number=raw['head_block_number'], #*
-        total_vesting_shares=raw['total_vesting_shares'],
-        total_vesting_fund_steem=raw['total_vesting_fund_steem'],
-        last_irreversible_block_num=raw['last_irreversible_block_num'], #*
-    )
@@ -27,6 +27,17 @@ async def get_account_votes(context, account):
                    "https://steemit.com/steemit/@steemitdev/additional-public-api-change")
 
 
+def _with_cursors(items, page, key, start_cursor):
+    """Add page cursors to items if the client opted in via `start_cursor`.
+
+    Passing `start_cursor` (blank for the first page) requests a `cursor`
+    on each item; a later call with that cursor resumes at the item."""
+    if start_cursor is not None:
+        for item in items:
+            item['cursor'] = page.cursors[item[key]]
+    return items
+
+
 # Follows Queries
 
 def _legacy_follower(follower, following, follow_type):
@@ -34,7 +45,7 @@ def _legacy_follower(follower, following, follow_type):
 
 @return_error_info
 async def get_followers(context, account: str, start: str, follow_type: str = None,
-                        limit: int = None, **kwargs):
+                        limit: int = None, start_cursor: str = None, **kwargs):
     """Get all accounts following `account`. (EOL)"""
     # `type` reserved word workaround
     if not follow_type and 'type' in kwargs:
@@ -46,12 +57,14 @@ async def get_followers(context, account: str, start: str, follow_type: str = No
         valid_account(account),
         valid_account(start, allow_empty=True),
         valid_follow_type(follow_type),
-        valid_limit(limit, 1000))
-    return [_legacy_follower(name, account, follow_type) for name in followers]
+        valid_limit(limit, 1000),
+        start_cursor)
+    return _with_cursors([_legacy_follower(name, account, follow_type) for name in followers],
+                         followers, 'follower', start_cursor)
 
 @return_error_info
 async def get_following(context, account: str, start: str, follow_type: str = None,
-                        limit: int = None, **kwargs):
+                        limit: int = None, start_cursor: str = None, **kwargs):
     """Get all accounts `account` follows. (EOL)"""
     # `type` reserved word workaround
     if not follow_type and 'type' in kwargs:
@@ -63,8 +76,10 @@ async def get_following(context, account: str, start: str, follow_type: str = No
         valid_account(account),
         valid_account(start, allow_empty=True),
         valid_follow_type(follow_type),
-        valid_limit(limit, 1000))
-    return [_legacy_follower(account, name, follow_type) for name in following]
+        valid_limit(limit, 1000),
+        start_cursor)
+    return _with_cursors([_legacy_follower(account, name, follow_type) for name in following],
+                         following, 'following', start_cursor)
 
 @return_error_info
 async def get_follow_count(context, account: str):
@@ -98,13 +113,13 @@ async def get_account_reputations(context, account_lower_bound: str = None, limi
 @return_error_info
 async def get_content(context, author: str, permlink: str):
     """Get a single post object."""
-    db = context['db']
     valid_account(author)
     valid_permlink(permlink)
-    post_id = await get_post_id(db, author, permlink)
-    if not post_id:
-        return {'id': 0, 'author': '', 'permlink': ''}
-    posts = await load_posts(db, [post_id])
+    async with context['db'].session() as db:
+        post_id = await get_post_id(db, author, permlink)
+        if not post_id:
+            return {'id': 0, 'author': '', 'permlink': ''}
+        posts = await load_posts(db, [post_id])
     assert posts, 'post was not found in cache'
     return posts[0]
 
@@ -112,14 +127,14 @@ async def get_content(context, author: str, permlink: str):
 @return_error_info
 async def get_content_replies(context, author: str, permlink: str):
     """Get a list of post objects based on parent."""
-    db = context['db']
     valid_account(author)
     valid_permlink(permlink)
-    parent_id = await get_post_id(db, author, permlink)
-    if parent_id:
-        child_ids = await get_child_ids(db, parent_id)
-        if child_ids:
-            return await load_posts(db, child_ids)
+    async with context['db'].session() as db:
+        parent_id = await get_post_id(db, author, permlink)
+        if parent_id:
+            child_ids = await get_child_ids(db, parent_id)
+            if child_ids:
+                return await load_posts(db, child_ids)
     return []
 
 
@@ -150,7 +165,8 @@ def nested_query_compat(function):
 @nested_query_compat
 async def get_discussions_by_trending(context, start_author: str = '', start_permlink: str = '',
                                       limit: int = 20, tag: str = None,
-                                      truncate_body: int = 0, filter_tags: list = None):
+                                      truncate_body: int = 0, filter_tags: list = None,
+                                      start_cursor: str = None):
     """Query posts, sorted by trending score."""
     assert not filter_tags, 'filter_tags not supported'
     ids = await cursor.pids_by_query(
@@ -159,15 +175,18 @@ async def get_discussions_by_trending(context, start_author: str = '', start_per
         valid_account(start_author, allow_empty=True),
         valid_permlink(start_permlink, allow_empty=True),
         valid_limit(limit, 100),
-        valid_tag(tag, allow_empty=True))
-    return await load_posts(context['db'], ids, truncate_body=truncate_body)
+        valid_tag(tag, allow_empty=True),
+        start_cursor)
+    posts = await load_posts(context['db'], ids, truncate_body=truncate_body)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_discussions_by_hot(context, start_author: str = '', start_permlink: str = '',
                                  limit: int = 20, tag: str = None,
-                                 truncate_body: int = 0, filter_tags: list = None):
+                                 truncate_body: int = 0, filter_tags: list = None,
+                                 start_cursor: str = None):
     """Query posts, sorted by hot score."""
     assert not filter_tags, 'filter_tags not supported'
     ids = await cursor.pids_by_query(
@@ -176,15 +195,18 @@ async def get_discussions_by_hot(context, start_author: str = '', start_permlink
         valid_account(start_author, allow_empty=True),
         valid_permlink(start_permlink, allow_empty=True),
         valid_limit(limit, 100),
-        valid_tag(tag, allow_empty=True))
-    return await load_posts(context['db'], ids, truncate_body=truncate_body)
+        valid_tag(tag, allow_empty=True),
+        start_cursor)
+    posts = await load_posts(context['db'], ids, truncate_body=truncate_body)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_discussions_by_promoted(context, start_author: str = '', start_permlink: str = '',
                                       limit: int = 20, tag: str = None,
-                                      truncate_body: int = 0, filter_tags: list = None):
+                                      truncate_body: int = 0, filter_tags: list = None,
+                                      start_cursor: str = None):
     """Query posts, sorted by promoted amount."""
     assert not filter_tags, 'filter_tags not supported'
     ids = await cursor.pids_by_query(
@@ -193,15 +215,18 @@ async def get_discussions_by_promoted(context, start_author: str = '', start_per
         valid_account(start_author, allow_empty=True),
         valid_permlink(start_permlink, allow_empty=True),
         valid_limit(limit, 100),
-        valid_tag(tag, allow_empty=True))
-    return await load_posts(context['db'], ids, truncate_body=truncate_body)
+        valid_tag(tag, allow_empty=True),
+        start_cursor)
+    posts = await load_posts(context['db'], ids, truncate_body=truncate_body)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_discussions_by_created(context, start_author: str = '', start_permlink: str = '',
                                      limit: int = 20, tag: str = None,
-                                     truncate_body: int = 0, filter_tags: list = None):
+                                     truncate_body: int = 0, filter_tags: list = None,
+                                     start_cursor: str = None):
     """Query posts, sorted by creation date."""
     assert not filter_tags, 'filter_tags not supported'
     ids = await cursor.pids_by_query(
@@ -210,15 +235,18 @@ async def get_discussions_by_created(context, start_author: str = '', start_perm
         valid_account(start_author, allow_empty=True),
         valid_permlink(start_permlink, allow_empty=True),
         valid_limit(limit, 100),
-        valid_tag(tag, allow_empty=True))
-    return await load_posts(context['db'], ids, truncate_body=truncate_body)
+        valid_tag(tag, allow_empty=True),
+        start_cursor)
+    posts = await load_posts(context['db'], ids, truncate_body=truncate_body)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_discussions_by_blog(context, tag: str = None, start_author: str = '',
                                   start_permlink: str = '', limit: int = 20,
-                                  truncate_body: int = 0, filter_tags: list = None):
+                                  truncate_body: int = 0, filter_tags: list = None,
+                                  start_cursor: str = None):
     """Retrieve account's blog posts, including reblogs."""
     assert tag, '`tag` cannot be blank'
     assert not filter_tags, 'filter_tags not supported'
@@ -227,15 +255,18 @@ async def get_discussions_by_blog(context, tag: str = None, start_author: str =
         valid_account(tag),
         valid_account(start_author, allow_empty=True),
         valid_permlink(start_permlink, allow_empty=True),
-        valid_limit(limit, 100))
-    return await load_posts(context['db'], ids, truncate_body=truncate_body)
+        valid_limit(limit, 100),
+        start_cursor=start_cursor)
+    posts = await load_posts(context['db'], ids, truncate_body=truncate_body)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_discussions_by_feed(context, tag: str = None, start_author: str = '',
                                   start_permlink: str = '', limit: int = 20,
-                                  truncate_body: int = 0, filter_tags: list = None):
+                                  truncate_body: int = 0, filter_tags: list = None,
+                                  start_cursor: str = None):
     """Retrieve account's personalized feed."""
     assert tag, '`tag` cannot be blank'
     assert not filter_tags, 'filter_tags not supported'
@@ -244,15 +275,17 @@ async def get_discussions_by_feed(context, tag: str = None, start_author: str =
         valid_account(tag),
         valid_account(start_author, allow_empty=True),
         valid_permlink(start_permlink, allow_empty=True),
-        valid_limit(limit, 100))
-    return await load_posts_reblogs(context['db'], res, truncate_body=truncate_body)
+        valid_limit(limit, 100),
+        start_cursor=start_cursor)
+    posts = await load_posts_reblogs(context['db'], res, truncate_body=truncate_body)
+    return _with_cursors(posts, res, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_discussions_by_comments(context, start_author: str = None, start_permlink: str = '',
                                       limit: int = 20, truncate_body: int = 0,
-                                      filter_tags: list = None):
+                                      filter_tags: list = None, start_cursor: str = None):
     """Get comments by made by author."""
     assert start_author, '`start_author` cannot be blank'
     assert not filter_tags, 'filter_tags not supported'
@@ -260,28 +293,34 @@ async def get_discussions_by_comments(context, start_author: str = None, start_p
         context['db'],
         valid_account(start_author),
         valid_permlink(start_permlink, allow_empty=True),
-        valid_limit(limit, 100))
-    return await load_posts(context['db'], ids, truncate_body=truncate_body)
+        valid_limit(limit, 100),
+        start_cursor=start_cursor)
+    posts = await load_posts(context['db'], ids, truncate_body=truncate_body)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_replies_by_last_update(context, start_author: str = None, start_permlink: str = '',
-                                     limit: int = 20, truncate_body: int = 0):
+                                     limit: int = 20, truncate_body: int = 0,
+                                     start_cursor: str = None):
     """Get all replies made to any of author's posts."""
     assert start_author, '`start_author` cannot be blank'
     ids = await cursor.pids_by_replies_to_account(
         context['db'],
         valid_account(start_author),
         valid_permlink(start_permlink, allow_empty=True),
-        valid_limit(limit, 100))
-    return await load_posts(context['db'], ids, truncate_body=truncate_body)
+        valid_limit(limit, 100),
+        start_cursor=start_cursor)
+    posts = await load_posts(context['db'], ids, truncate_body=truncate_body)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_discussions_by_author_before_date(context, author: str = None, start_permlink: str = '',
-                                                before_date: str = '', limit: int = 10):
+                                                before_date: str = '', limit: int = 10,
+                                                start_cursor: str = None):
     """Retrieve account's blog posts, without reblogs.
 
     NOTE: before_date is completely ignored, and it appears to be broken and/or
@@ -294,15 +333,17 @@ async def get_discussions_by_author_before_date(context, author: str = None, sta
         context['db'],
         valid_account(author),
         valid_permlink(start_permlink, allow_empty=True),
-        valid_limit(limit, 100))
-    return await load_posts(context['db'], ids)
+        valid_limit(limit, 100),
+        start_cursor=start_cursor)
+    posts = await load_posts(context['db'], ids)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_post_discussions_by_payout(context, start_author: str = '', start_permlink: str = '',
                                          limit: int = 20, tag: str = None,
-                                         truncate_body: int = 0):
+                                         truncate_body: int = 0, start_cursor: str = None):
     """Query top-level posts, sorted by payout."""
     ids = await cursor.pids_by_query(
         context['db'],
@@ -310,15 +351,17 @@ async def get_post_discussions_by_payout(context, start_author: str = '', start_
         valid_account(start_author, allow_empty=True),
         valid_permlink(start_permlink, allow_empty=True),
         valid_limit(limit, 100),
-        valid_tag(tag, allow_empty=True))
-    return await load_posts(context['db'], ids, truncate_body=truncate_body)
+        valid_tag(tag, allow_empty=True),
+        start_cursor)
+    posts = await load_posts(context['db'], ids, truncate_body=truncate_body)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
 @nested_query_compat
 async def get_comment_discussions_by_payout(context, start_author: str = '', start_permlink: str = '',
                                             limit: int = 20, tag: str = None,
-                                            truncate_body: int = 0):
+                                            truncate_body: int = 0, start_cursor: str = None):
     """Query comments, sorted by payout."""
     ids = await cursor.pids_by_query(
         context['db'],
@@ -326,8 +369,10 @@ async def get_comment_discussions_by_payout(context, start_author: str = '', sta
         valid_account(start_author, allow_empty=True),
         valid_permlink(start_permlink, allow_empty=True),
         valid_limit(limit, 100),
-        valid_tag(tag, allow_empty=True))
-    return await load_posts(context['db'], ids, truncate_body=truncate_body)
+        valid_tag(tag, allow_empty=True),
+        start_cursor)
+    posts = await load_posts(context['db'], ids, truncate_body=truncate_body)
+    return _with_cursors(posts, ids, 'post_id', start_cursor)
 
 
 @return_error_info
@@ -5,6 +5,7 @@ import ujson as json
 
 from hive.utils.normalize import sbd_amount, rep_to_raw
 from hive.server.common.mutes import Mutes
+from hive.server.common.post_cache import PostCache
 
 log = logging.getLogger(__name__)
 
@@ -38,25 +39,70 @@ async def load_posts_keyed(db, ids, truncate_body=0):
     """Given an array of post ids, returns full posts objects keyed by id."""
     assert ids, 'no ids passed to load_posts_keyed'
 
-    # fetch posts and associated author reps
-    sql = """SELECT post_id, author, permlink, title, body, category, depth,
-                    promoted, payout, payout_at, is_paidout, children, votes,
-                    created_at, updated_at, rshares, raw_json, json
+    # probe current versions; only stale or missing posts are fully loaded
+    sql = """SELECT post_id, author, promoted, payout, is_paidout, children,
+                    updated_at, rshares, md5(votes) AS votes_md5
                FROM hive_posts_cache WHERE post_id IN :ids"""
-    result = await db.query_all(sql, ids=tuple(ids))
-    author_reps = await _query_author_rep_map(db, result)
+    cache = PostCache.instance()
+    async with db.session() as db:
+        result = await db.query_all(sql, ids=tuple(ids))
+        author_reps = await _query_author_rep_map(db, result)
+        posts = await _load_post_objects(db, cache, result)
 
     muted_accounts = Mutes.all()
     posts_by_id = {}
     for row in result:
-        row = dict(row)
-        row['author_rep'] = author_reps[row['author']]
-        post = _condenser_post_object(row, truncate_body=truncate_body)
+        pid = row['post_id']
+        post = posts.get(pid)
+        if not post:
+            continue # removed from cache table after version probe
+
+        # per-request fields are applied to the copy
+        post['author_reputation'] = rep_to_raw(author_reps[row['author']])
+        if truncate_body:
+            post['body'] = post['body'][0:truncate_body]
         post['active_votes'] = _mute_votes(post['active_votes'], muted_accounts)
-        posts_by_id[row['post_id']] = post
+        posts_by_id[pid] = post
 
     return posts_by_id
 
+async def _load_post_objects(db, cache, versions):
+    """Get post objects by id; read from cache where current, else build
+    and cache them.
+
+    Cached copies are taken at probe time, so later evictions (by puts
+    here or concurrent requests) cannot drop them."""
+    posts = {}
+    stale_ids = []
+    for row in versions:
+        post = cache.get(row['post_id'], _post_version(row))
+        if post:
+            posts[row['post_id']] = post
+        else:
+            stale_ids.append(row['post_id'])
+    if not stale_ids:
+        return posts
+
+    sql = """SELECT post_id, author, permlink, title, body, category, depth,
+                    promoted, payout, payout_at, is_paidout, children, votes,
+                    created_at, updated_at, rshares, raw_json, json,
+                    md5(votes) AS votes_md5
+               FROM hive_posts_cache WHERE post_id IN :ids"""
+    for row in await db.query_all(sql, ids=tuple(stale_ids)):
+        post = _condenser_post_object(dict(row))
+        cache.put(row['post_id'], _post_version(row), post)
+        posts[row['post_id']] = post
+    return posts
+
+def _post_version(row):
+    """Given a hive_posts_cache row, get a tuple which changes on update.
+
+    Votes which move neither payout nor rshares (e.g. 0% or re-votes)
+    are caught by the hash of the votes csv."""
+    return (row['updated_at'], row['payout'], row['is_paidout'],
+            row['promoted'], row['children'], row['rshares'],
+            row['votes_md5'])
+
 def _mute_votes(votes, muted_accounts):
     if not muted_accounts:
         return votes
@@ -67,23 +113,24 @@ async def load_posts(db, ids, truncate_body=0):
     if not ids:
         return []
 
-    # posts are keyed by id so we can return output sorted by input order
-    posts_by_id = await load_posts_keyed(db, ids, truncate_body=truncate_body)
-
-    # in rare cases of cache inconsistency, recover and warn
-    missed = set(ids) - posts_by_id.keys()
-    if missed:
-        log.info("get_posts do not exist in cache: %s", repr(missed))
-        for _id in missed:
-            ids.remove(_id)
-            sql = ("SELECT id, author, permlink, depth, created_at, is_deleted "
-                   "FROM hive_posts WHERE id = :id")
-            post = await db.query_row(sql, id=_id)
-            if not post['is_deleted']:
-                # TODO: This should never happen. See #173 for analysis
-                log.error("missing post -- %s", dict(post))
-            else:
-                log.info("requested deleted post: %s", dict(post))
+    async with db.session() as db:
+        # posts are keyed by id so we can return output sorted by input order
+        posts_by_id = await load_posts_keyed(db, ids, truncate_body=truncate_body)
+
+        # in rare cases of cache inconsistency, recover and warn
+        missed = set(ids) - posts_by_id.keys()
+        if missed:
+            log.info("get_posts do not exist in cache: %s", repr(missed))
+            for _id in missed:
+                ids.remove(_id)
+                sql = ("SELECT id, author, permlink, depth, created_at, is_deleted "
+                       "FROM hive_posts WHERE id = :id")
+                post = await db.query_row(sql, id=_id)
+                if not post['is_deleted']:
+                    # TODO: This should never happen. See #173 for analysis
+                    log.error("missing post -- %s", dict(post))
+                else:
+                    log.info("requested deleted post: %s", dict(post))
 
     return [posts_by_id[_id] for _id in ids]
 
@@ -119,7 +166,11 @@ def _condenser_account_object(row):
                        }})}
 
 def _condenser_post_object(row, truncate_body=0):
-    """Given a hive_posts_cache row, create a legacy-style post object."""
+    """Given a hive_posts_cache row, create a legacy-style post object.
+
+    `author_reputation` is not set here since it is tracked per-account,
+    not per-post; see `load_posts_keyed`.
+    """
     paid = row['is_paidout']
 
     # condenser#3424 mitigation
@@ -152,7 +203,6 @@ def _condenser_post_object(row, truncate_body=0):
     post['replies'] = []
     post['body_length'] = len(row['body'])
     post['active_votes'] = _hydrate_active_votes(row['votes'])
-    post['author_reputation'] = rep_to_raw(row['author_rep'])
 
     # import fields from legacy object
     assert row['raw_json']
@@ -1,57 +1,58 @@
 """condenser_api trending tag fetching methods"""
 
-from aiocache import cached
 from hive.server.condenser_api.common import (return_error_info, valid_tag, valid_limit)
 
 @return_error_info
-@cached(ttl=7200, timeout=1200)
 async def get_top_trending_tags_summary(context):
     """Get top 50 trending tags among pending posts."""
-    # Same results, more overhead:
-    #return [tag['name'] for tag in await get_trending_tags('', 50)]
+    return await top_trending_tags_summary(context['db'])
+
+async def top_trending_tags_summary(db):
+    """Query top 50 trending tags among pending posts."""
     sql = """
         SELECT category
-          FROM hive_posts_cache
-         WHERE is_paidout = '0'
-      GROUP BY category
-      ORDER BY SUM(payout) DESC
+          FROM hive_tag_stats
+         WHERE total_posts > 0
+      ORDER BY total_payouts DESC, category DESC
          LIMIT 50
     """
-    return await context['db'].query_col(sql)
+    return await db.query_col(sql)
 
 @return_error_info
-@cached(ttl=3600, timeout=1200)
 async def get_trending_tags(context, start_tag: str = '', limit: int = 250):
     """Get top 250 trending tags among pending posts, with stats."""
 
     limit = valid_limit(limit, ubound=250)
     start_tag = valid_tag(start_tag or '', allow_empty=True)
+    return await trending_tags(context['db'], start_tag, limit)
+
+async def trending_tags(db, start_tag='', limit=250):
+    """Query trending tags among pending posts, with stats."""
 
     if start_tag:
         seek = """
-          HAVING SUM(payout) <= (
-            SELECT SUM(payout)
-              FROM hive_posts_cache
-             WHERE is_paidout = '0'
-               AND category = :start_tag)
+          AND (total_payouts, category) <= (
+            SELECT total_payouts, category
+              FROM hive_tag_stats
+             WHERE category = :start_tag)
         """
     else:
         seek = ''
 
+    # maintained incrementally by the indexer (see CachedPost)
     sql = """
       SELECT category,
-             COUNT(*) AS total_posts,
-             SUM(CASE WHEN depth = 0 THEN 1 ELSE 0 END) AS top_posts,
-             SUM(payout) AS total_payouts
-        FROM hive_posts_cache
-       WHERE is_paidout = '0'
-    GROUP BY category %s
-    ORDER BY SUM(payout) DESC
+             total_posts,
+             top_posts,
+             total_payouts
+        FROM hive_tag_stats
+       WHERE total_posts > 0 %s
+    ORDER BY total_payouts DESC, category DESC
        LIMIT :limit
     """ % seek
 
     out = []
-    for row in await context['db'].query_all(sql, limit=limit, start_tag=start_tag):
+    for row in await db.query_all(sql, limit=limit, start_tag=start_tag):
         out.append({
             'name': row['category'],
             'comments': row['total_posts'] - row['top_posts'],
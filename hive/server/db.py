@@ -1,9 +1,12 @@
 """Async DB adapter for hivemind API."""
 
+import asyncio
+import copy
 import logging
 from time import perf_counter as perf
 
 from hive.utils.stats import Stats
+from hive.server.common.single_flight import SingleFlight
 
 import sqlalchemy
 from sqlalchemy.engine.url import make_url
@@ -21,77 +24,252 @@ def sqltimer(function):
         return result
     return _wrapper
 
+def coalesce(function):
+    """Decorator for DB read methods which shares identical queries in flight."""
+    async def _wrapper(self, sql, **kwargs):
+        if not self.flight:
+            return await function(self, sql, **kwargs)
+        key = (function.__name__, sql, repr(sorted(kwargs.items())))
+        result = await self.flight.run(key, lambda: function(self, sql, **kwargs))
+        # callers may mutate result lists (e.g. `load_posts`); hand out copies
+        return list(result) if isinstance(result, list) else result
+    return _wrapper
+
+class _Pool:
+    """An aiopg.sa engine plus read routing state."""
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.outstanding = 0
+        self.lag = 0
+        self.healthy = True
+        self.acquires = 0
+        self.wait_secs = 0.0
+
+    def acquire(self):
+        """Acquire a connection, counting it as outstanding until released."""
+        return _Acquire(self)
+
+    def stats(self):
+        """Get current load and replication state."""
+        return dict(outstanding=self.outstanding,
+                    lag=self.lag,
+                    healthy=self.healthy,
+                    size=self.engine.size,
+                    free=self.engine.freesize,
+                    acquires=self.acquires,
+                    wait_ms=round(self.wait_secs * 1000))
+
+class _Acquire:
+    """Async context manager around `engine.acquire()` for `_Pool`."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._ctx = None
+        self.wait = 0.0
+
+    async def __aenter__(self):
+        self._pool.outstanding += 1
+        try:
+            start = perf()
+            self._ctx = self._pool.engine.acquire()
+            conn = await self._ctx.__aenter__()
+        except BaseException:
+            self._pool.outstanding -= 1
+            raise
+        self.wait = perf() - start
+        self._pool.acquires += 1
+        self._pool.wait_secs += self.wait
+        return conn
+
+    async def __aexit__(self, *exc):
+        self._pool.outstanding -= 1
+        return await self._ctx.__aexit__(*exc)
+
 class Db:
-    """Wrapper for aiopg.sa db driver."""
+    """Wrapper for aiopg.sa db driver.
+
+    Writes and LISTEN go to the primary. Reads are routed to whichever
+    of the primary and healthy replicas has the fewest outstanding
+    queries; replicas lagging more than `max_lag` blocks are skipped.
+    """
+
+    LAG_CHECK_SECS = 5
 
     @classmethod
-    async def create(cls, url):
+    async def create(cls, url, coalesce_reads=False, replica_urls=(),
+                     pool_size=20, replica_pool_size=20, max_lag=10):
         """Factory method."""
-        instance = Db()
-        await instance.init(url)
+        instance = cls()
+        if coalesce_reads:
+            instance.flight = SingleFlight()
+        await instance.init(url, replica_urls, pool_size, replica_pool_size)
+        if instance.replicas:
+            instance.max_lag = max_lag
+            instance.monitor = asyncio.ensure_future(instance.monitor_lag())
         return instance
 
     def __init__(self):
-        self.db = None
+        self.primary = None
+        self.replicas = []
+        self.max_lag = None
+        self.monitor = None
+        self.flight = None
         self._prep_sql = {}
+        self._primary_view = None
+
+    async def init(self, url, replica_urls=(), pool_size=20, replica_pool_size=20):
+        """Initialize the aiopg.sa engines."""
+        self.primary = _Pool('primary', await self._engine(url, pool_size))
+        for i, replica_url in enumerate(replica_urls):
+            engine = await self._engine(replica_url, replica_pool_size)
+            self.replicas.append(_Pool('replica%d' % i, engine))
 
-    async def init(self, url):
-        """Initialize the aiopg.sa engine."""
+    @staticmethod
+    async def _engine(url, maxsize):
         conf = make_url(url)
-        self.db = await create_engine(user=conf.username,
-                                      database=conf.database,
-                                      password=conf.password,
-                                      host=conf.host,
-                                      port=conf.port,
-                                      maxsize=20,
-                                      **conf.query)
+        return await create_engine(user=conf.username,
+                                   database=conf.database,
+                                   password=conf.password,
+                                   host=conf.host,
+                                   port=conf.port,
+                                   maxsize=maxsize,
+                                   **conf.query)
+
+    def primary_reads(self):
+        """Get a view of this db which reads from the primary only.
+
+        For results shared beyond the request (e.g. the response cache,
+        keyed by the indexer's head block): a lagging replica's result
+        must not be cached as current. The view shares pools, but its
+        reads are not coalesced with replica-routed ones."""
+        # pylint: disable=protected-access
+        if not self.replicas:
+            return self
+        if not self._primary_view:
+            view = copy.copy(self)
+            view.replicas = []
+            view.flight = None
+            view._primary_view = view
+            self._primary_view = view
+        return self._primary_view
+
+    def _pools(self):
+        return [self.primary] + self.replicas
+
+    def _reader(self):
+        """Pick pool for a read: least outstanding, replicas preferred."""
+        candidates = [pool for pool in self.replicas if pool.healthy]
+        candidates.append(self.primary)
+        return min(candidates, key=lambda pool: pool.outstanding)
+
+    async def monitor_lag(self):
+        """Periodically compare replica head blocks against primary."""
+        sql = "SELECT num FROM hive_blocks ORDER BY num DESC LIMIT 1"
+        while True:
+            await asyncio.sleep(self.LAG_CHECK_SECS)
+            try:
+                async with self.primary.acquire() as conn:
+                    head = (await self._fetch_row(conn, sql))[0]
+            except Exception as e:
+                log.warning("lag check: primary unavailable (%s)", repr(e))
+                continue
+            for pool in self.replicas:
+                try:
+                    async with pool.engine.acquire() as conn:
+                        num = (await self._fetch_row(conn, sql))[0]
+                    lag = (head or 0) - (num or 0)
+                except Exception as e:
+                    log.warning("lag check: %s unavailable (%s)", pool.name, repr(e))
+                    lag = None
+                healthy = lag is not None and lag <= self.max_lag
+                if healthy != pool.healthy:
+                    log.warning("%s %s (lag: %s blocks)", pool.name,
+                                'restored' if healthy else 'dropped', lag)
+                pool.lag = lag
+                pool.healthy = healthy
+
+    def session(self):
+        """Get a session which runs all of its reads on one connection.
+
+        Usage: `async with db.session() as db: ...`
+        """
+        return Session(self)
+
+    def stats(self):
+        """Get per-pool load, lag and acquire wait time."""
+        return {pool.name: pool.stats() for pool in self._pools()}
 
     def close(self):
-        """Close pool."""
-        self.db.close()
+        """Close pools."""
+        if self.monitor:
+            self.monitor.cancel()
+        for pool in self._pools():
+            pool.engine.close()
 
     async def wait_closed(self):
         """Wait for releasing and closing all acquired connections."""
-        await self.db.wait_closed()
+        for pool in self._pools():
+            await pool.engine.wait_closed()
+
+    async def listen(self, channel, callback):
+        """LISTEN on `channel`; calls `callback(payload)` per NOTIFY.
 
+        Holds a dedicated primary connection until cancelled or closed."""
+        async with self.primary.engine.acquire() as conn:
+            await conn.execute("LISTEN %s" % channel)
+            log.info("listening for notifications on %s", channel)
+            while True:
+                msg = await conn.connection.notifies.get()
+                callback(msg.payload)
+
+    @coalesce
     @sqltimer
     async def query_all(self, sql, **kwargs):
         """Perform a `SELECT n*m`"""
-        async with self.db.acquire() as conn:
-            cur = await self._query(conn, sql, **kwargs)
-            res = await cur.fetchall()
-        return res
+        async with self._reader().acquire() as conn:
+            return await self._fetch_all(conn, sql, **kwargs)
 
+    @coalesce
     @sqltimer
     async def query_row(self, sql, **kwargs):
         """Perform a `SELECT 1*m`"""
-        async with self.db.acquire() as conn:
-            cur = await self._query(conn, sql, **kwargs)
-            res = await cur.first()
-        return res
+        async with self._reader().acquire() as conn:
+            return await self._fetch_row(conn, sql, **kwargs)
 
+    @coalesce
     @sqltimer
     async def query_col(self, sql, **kwargs):
         """Perform a `SELECT n*1`"""
-        async with self.db.acquire() as conn:
-            cur = await self._query(conn, sql, **kwargs)
-            res = await cur.fetchall()
+        async with self._reader().acquire() as conn:
+            res = await self._fetch_all(conn, sql, **kwargs)
         return [r[0] for r in res]
 
+    @coalesce
     @sqltimer
     async def query_one(self, sql, **kwargs):
         """Perform a `SELECT 1*1`"""
-        async with self.db.acquire() as conn:
-            cur = await self._query(conn, sql, **kwargs)
-            row = await cur.first()
+        async with self._reader().acquire() as conn:
+            row = await self._fetch_row(conn, sql, **kwargs)
         return row[0] if row else None
 
     @sqltimer
     async def query(self, sql, **kwargs):
         """Perform a write query"""
-        async with self.db.acquire() as conn:
+        async with self.primary.acquire() as conn:
             await self._query(conn, sql, **kwargs)
 
+    # driver-specific primitives; see also `AsyncpgDb`
+
+    async def _fetch_all(self, conn, sql, **kwargs):
+        cur = await self._query(conn, sql, **kwargs)
+        return await cur.fetchall()
+
+    async def _fetch_row(self, conn, sql, **kwargs):
+        cur = await self._query(conn, sql, **kwargs)
+        return await cur.first()
+
     async def _query(self, conn, sql, **kwargs):
         """Send a query off to SQLAlchemy."""
         try:
@@ -108,3 +286,81 @@ class Db:
             query = sqlalchemy.text(sql).execution_options(autocommit=False)
             self._prep_sql[sql] = query
         return query
+
+class Session:
+    """Runs a sequence of read queries on a single pooled connection.
+
+    Exposes the same query interface as `Db`, so handlers can pass it
+    wherever a `db` is expected. The connection is acquired on first
+    query and released on exit; nested `session()` calls reuse it.
+    Writes are delegated to the primary via `Db.query`.
+    """
+    # pylint: disable=protected-access
+
+    SLOW_WAIT_SECS = 0.1
+
+    def __init__(self, db):
+        self._db = db
+        self._acquire = None
+        self._conn = None
+        self.wait = 0.0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._acquire:
+            await self._acquire.__aexit__(*exc)
+            self._acquire = self._conn = None
+            if self.wait > self.SLOW_WAIT_SECS:
+                log.warning("session waited %dms for db connection",
+                            self.wait * 1000)
+
+    def session(self):
+        """Nested session: reuses this session's connection."""
+        return _Nested(self)
+
+    async def _connection(self):
+        if not self._conn:
+            self._acquire = self._db._reader().acquire()
+            self._conn = await self._acquire.__aenter__()
+            self.wait = self._acquire.wait
+        return self._conn
+
+    @sqltimer
+    async def query_all(self, sql, **kwargs):
+        """Perform a `SELECT n*m`"""
+        return await self._db._fetch_all(await self._connection(), sql, **kwargs)
+
+    @sqltimer
+    async def query_row(self, sql, **kwargs):
+        """Perform a `SELECT 1*m`"""
+        return await self._db._fetch_row(await self._connection(), sql, **kwargs)
+
+    @sqltimer
+    async def query_col(self, sql, **kwargs):
+        """Perform a `SELECT n*1`"""
+        res = await self._db._fetch_all(await self._connection(), sql, **kwargs)
+        return [r[0] for r in res]
+
+    @sqltimer
+    async def query_one(self, sql, **kwargs):
+        """Perform a `SELECT 1*1`"""
+        row = await self._db._fetch_row(await self._connection(), sql, **kwargs)
+        return row[0] if row else None
+
+    async def query(self, sql, **kwargs):
+        """Perform a write query (on primary)"""
+        return await self._db.query(sql, **kwargs)
+
+class _Nested:
+    """No-op context manager yielding an already open session."""
+
+    def __init__(self, session):
+        self._session = session
+
+    async def __aenter__(self):
+        return self._session
+
+    async def __aexit__(self, *exc):
+        pass
@@ -3,6 +3,7 @@ import logging
 
 from hive.server.hive_api.common import url_to_id, valid_comment_sort, valid_limit
 from hive.server.hive_api.objects import comments_by_id
+from hive.server.common.thread import load_thread
 log = logging.getLogger(__name__)
 
 # pylint: disable=too-many-arguments
@@ -101,36 +102,9 @@ def _build_tree(root_ids, tree, comments, sort_ids):
 
 async def _load_tree(db, root_id, muted, max_depth):
     """Build `ids` list and `tree` map."""
-    parent = {} # only loaded to max_depth
-    tree = {}   # loaded to max_depth + 1
-    todo = [root_id]
-    depth = 0
-    while todo:
-        depth += 1
-        rows = await _child_ids(db, todo, muted)
-        todo = []
-        for pid, cids in rows:
-            tree[pid] = cids
-            todo.extend(cids)
-            if depth <= max_depth:
-                for cid in cids:
-                    parent[cid] = pid
-        if depth > max_depth:
-            break
-
+    # tree loaded to max_depth + 1; parent only to max_depth
+    tree, depth = await load_thread(db, root_id, max_depth + 1,
+                                    muted=muted, valid_only=True)
+    parent = {cid: pid for pid, cids in tree.items()
+              if depth[pid] < max_depth for cid in cids}
     return (tree, parent)
-
-async def _child_ids(db, parent_ids, muted):
-    """Load child ids for multiple parent ids."""
-    filt = 'AND author NOT IN :muted' if muted else ''
-    sql = """
-             SELECT parent_id, array_agg(id)
-               FROM hive_posts
-              WHERE parent_id IN :ids
-                AND is_deleted = '0'
-                AND is_muted = '0'
-                AND is_valid = '1' %s
-           GROUP BY parent_id
-    """ % filt
-    rows = await db.query_all(sql, ids=tuple(parent_ids), muted=tuple(muted))
-    return [[row[0], row[1]] for row in rows]
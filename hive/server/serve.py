@@ -2,12 +2,15 @@
 """Hive JSON-RPC API server."""
 import os
 import sys
+import asyncio
 import logging
 import time
+from time import perf_counter as perf
 
 from datetime import datetime
 from sqlalchemy.exc import OperationalError
 from aiohttp import web
+import ujson as json
 from jsonrpcserver.methods import Methods
 from jsonrpcserver import async_dispatch as dispatch
 
@@ -16,6 +19,9 @@ from hive.server.condenser_api.tags import get_trending_tags as condenser_api_ge
 from hive.server.condenser_api.get_state import get_state as condenser_api_get_state
 from hive.server.condenser_api.call import call as condenser_api_call
 from hive.server.common.mutes import Mutes
+from hive.server.common.post_cache import PostCache
+from hive.server.common.response_cache import ResponseCache, cacheable, BLOCK_CHANNEL
+from hive.server.common.single_flight import SingleFlight, coalesced
 
 from hive.server.db import Db
 
@@ -101,6 +107,27 @@ def build_methods():
         'call': condenser_api_call
     })
 
+    # serve hot read methods from block-scoped response cache
+    wrapped = {method: cacheable(method) for method in (
+        condenser_api.get_content,
+        condenser_api.get_content_replies,
+        condenser_api_get_state,
+        condenser_api_get_trending_tags,
+        condenser_api.get_discussions_by_trending,
+        condenser_api.get_discussions_by_hot,
+        condenser_api.get_discussions_by_promoted,
+        condenser_api.get_discussions_by_created,
+        condenser_api.get_post_discussions_by_payout,
+        condenser_api.get_comment_discussions_by_payout,
+    )}
+    methods.add(**{name: wrapped[method]
+                   for name, method in methods.items.items()
+                   if method in wrapped})
+
+    # identical concurrent calls share a single execution
+    methods.add(**{name: coalesced(method)
+                   for name, method in methods.items.items()})
+
     return methods
 
 def truncate_response_log(logger):
@@ -120,6 +147,19 @@ def truncate_response_log(logger):
 
 def run_server(conf):
     """Configure and launch the API server."""
+    workers = conf.get('workers')
+    if workers > 1:
+        from hive.server.workers import Supervisor
+        Supervisor(workers, serve, args=(conf,)).run()
+    else:
+        serve(conf)
+
+def serve(conf, worker=None, stats_queue=None):
+    """Launch the API server in this process.
+
+    If `worker` is given, the port is shared with sibling processes and
+    stats are periodically pushed to `stats_queue` for the supervisor.
+    """
 
     # configure jsonrpcserver logging
     log_level = conf.log_level()
@@ -134,6 +174,8 @@ def run_server(conf):
     mutes = Mutes(conf.get('muted_accounts_url'))
     Mutes.set_shared_instance(mutes)
 
+    PostCache.set_shared_instance(PostCache(conf.get('post_cache_size')))
+
     app = web.Application()
     app['config'] = dict()
     app['config']['args'] = conf.args()
@@ -143,15 +185,73 @@ def run_server(conf):
     async def init_db(app):
         """Initialize db adapter."""
         args = app['config']['args']
-        app['db'] = await Db.create(args['database_url'])
+        replicas = [url for url in args['database_replica_urls'].split(',') if url]
+        db_cls = Db
+        if args['db_driver'] == 'asyncpg':
+            from hive.server.asyncpg_db import AsyncpgDb
+            db_cls = AsyncpgDb
+        app['db'] = await db_cls.create(args['database_url'],
+                                        coalesce_reads=args['coalesce_queries'],
+                                        replica_urls=replicas,
+                                        pool_size=args['db_pool_size'],
+                                        replica_pool_size=args['db_replica_pool_size'],
+                                        max_lag=args['replica_max_lag'])
+        app['single_flight'] = SingleFlight()
+        if args['response_cache_size']:
+            app['response_cache'] = ResponseCache(
+                max_size=args['response_cache_size'],
+                stale_secs=args['response_stale_ms'] / 1000)
+            app['block_listener'] = asyncio.ensure_future(listen_blocks(app))
+        app['mutes_refresher'] = asyncio.ensure_future(Mutes.instance().refresh_loop())
 
     async def close_db(app):
         """Teardown db adapter."""
+        if 'block_listener' in app:
+            app['block_listener'].cancel()
+        if 'stats_reporter' in app:
+            app['stats_reporter'].cancel()
+        app['mutes_refresher'].cancel()
         app['db'].close()
         await app['db'].wait_closed()
 
+    async def listen_blocks(app):
+        """Invalidate response cache whenever sync commits a block."""
+        cache = app['response_cache']
+        while True:
+            try:
+                await app['db'].listen(BLOCK_CHANNEL, cache.new_block)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("block listener failed (%s); retrying", repr(e))
+            cache.new_block(None) # no way to detect new blocks; disable
+            await asyncio.sleep(5)
+
+    def app_stats():
+        """Get db pool, cache and coalescing stats for this process."""
+        return dict(
+            db=app['db'].stats(),
+            caches=dict(posts=PostCache.instance().stats(),
+                        responses=(app['response_cache'].stats()
+                                   if 'response_cache' in app else None)),
+            coalesced=dict(methods=app['single_flight'].stats(),
+                           queries=(app['db'].flight.stats()
+                                    if app['db'].flight else None)))
+
+    async def report_stats(app):
+        """Periodically push this worker's stats to the supervisor."""
+        while True:
+            await asyncio.sleep(60)
+            stats_queue.put((worker, app_stats()))
+
+    async def start_stats_reporter(app):
+        """Start stats push loop (worker mode only)."""
+        app['stats_reporter'] = asyncio.ensure_future(report_stats(app))
+
     app.on_startup.append(init_db)
     app.on_cleanup.append(close_db)
+    if stats_queue is not None:
+        app.on_startup.append(start_stats_reporter)
 
     async def head_age(request):
         """Get hive head block age in seconds. 500 status if age > 15s."""
@@ -198,18 +298,55 @@ def run_server(conf):
             result=result,
             status='OK' if status == 200 else 'WARN',
             sync_service=is_syncer,
+            worker=worker,
+            **app_stats(),
             source_commit=os.environ.get('SOURCE_COMMIT'),
             schema_hash=os.environ.get('SCHEMA_HASH'),
             docker_tag=os.environ.get('DOCKER_TAG'),
             timestamp=datetime.utcnow().isoformat()))
 
+    async def dispatch_element(element, semaphore):
+        """Dispatch one batch element, bounded by its batch's semaphore."""
+        async with semaphore:
+            start = perf()
+            response = await dispatch(json.dumps(element), methods=methods,
+                                      debug=True, context=app)
+            secs = perf() - start
+        if secs > 1:
+            log.warning("slow batch element (%.3fs): %.256s", secs, element)
+        return response
+
+    async def dispatch_batch(batch):
+        """Execute batch elements concurrently; responses keep their order.
+
+        Concurrency is capped per batch, so one large batch cannot hog
+        the db pool; separate requests do not share the cap."""
+        start = perf()
+        semaphore = asyncio.Semaphore(conf.get('batch_concurrency'))
+        responses = await asyncio.gather(*[dispatch_element(element, semaphore)
+                                           for element in batch])
+        log.debug("batch of %d done in %.3fs", len(batch), perf() - start)
+        return [r.deserialized() for r in responses if r.wanted]
+
     async def jsonrpc_handler(request):
         """Handles all hive jsonrpc API requests."""
         request = await request.text()
+        headers = {'Access-Control-Allow-Origin': '*'}
+
+        try:
+            batch = json.loads(request)
+        except ValueError:
+            batch = None # let dispatcher build the parse error response
+
+        if isinstance(batch, list) and batch:
+            result = await dispatch_batch(batch)
+            if result:
+                return web.json_response(result, status=200, headers=headers)
+            return web.Response()
+
         # debug=True refs https://github.com/bcb/jsonrpcserver/issues/71
         response = await dispatch(request, methods=methods, debug=True, context=app)
         if response.wanted:
-            headers = {'Access-Control-Allow-Origin': '*'}
             return web.json_response(response.deserialized(), status=200, headers=headers)
         return web.Response()
 
@@ -219,4 +356,5 @@ def run_server(conf):
     app.router.add_get('/health', health)
     app.router.add_post('/', jsonrpc_handler)
 
-    web.run_app(app, port=app['config']['args']['http_server_port'])
+    web.run_app(app, port=app['config']['args']['http_server_port'],
+                reuse_port=worker is not None)
@@ -0,0 +1,123 @@
+"""Pre-fork multi-process mode for API server."""
+
+import logging
+import multiprocessing
+import queue
+import signal
+import time
+
+log = logging.getLogger(__name__)
+
+def merge_stats(reports):
+    """Combine per-worker stats reports by summing their counters."""
+    merged = {}
+    for report in reports:
+        for key, val in (report or {}).items():
+            if isinstance(val, dict):
+                merged[key] = merge_stats([merged.get(key), val])
+            elif key == 'block_num':
+                merged[key] = max(filter(None, [merged.get(key), val]), default=None)
+            elif isinstance(val, (int, float)) and key != 'hit_rate':
+                merged[key] = merged.get(key, 0) + val
+    if 'hits' in merged and 'misses' in merged:
+        hits = merged['hits'] + merged.get('stale_hits', 0)
+        total = hits + merged['misses']
+        merged['hit_rate'] = round(hits / total, 3) if total else None
+    return merged
+
+def _worker_main(target, *args):
+    """Worker entry point; drop supervisor's signal handlers."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    target(*args)
+
+class Supervisor:
+    """Forks server workers which share a port via SO_REUSEPORT.
+
+    Each worker runs its own event loop, db pool and caches. Dead workers
+    are replaced; workers periodically push stats which are combined and
+    logged by the supervisor.
+    """
+
+    REPORT_SECS = 300
+    RESTART_DELAY_SECS = 1
+
+    def __init__(self, count, target, args=()):
+        self._count = count
+        self._target = target
+        self._args = args
+        self._ctx = multiprocessing.get_context('fork')
+        self._queue = self._ctx.Queue()
+        self._workers = {}  # slot -> process
+        self._reports = {}  # slot -> latest stats
+        self._running = False
+
+    def run(self):
+        """Start workers and supervise until SIGINT/SIGTERM."""
+        self._running = True
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for slot in range(self._count):
+            self._spawn(slot)
+        log.info("supervising %d server workers", self._count)
+
+        last_report = time.time()
+        while self._running:
+            self._drain_stats(timeout=1)
+            self._restart_dead()
+            if time.time() - last_report > self.REPORT_SECS:
+                self.report()
+                last_report = time.time()
+
+        self._shutdown()
+
+    def _spawn(self, slot):
+        proc = self._ctx.Process(target=_worker_main,
+                                 args=(self._target, *self._args, slot, self._queue),
+                                 name='hive-server-%d' % slot)
+        proc.start()
+        self._workers[slot] = proc
+        log.info("started worker %d (pid %d)", slot, proc.pid)
+
+    def _restart_dead(self):
+        for slot, proc in list(self._workers.items()):
+            if proc.is_alive() or not self._running:
+                continue
+            log.warning("worker %d (pid %d) exited with %s; restarting",
+                        slot, proc.pid, proc.exitcode)
+            self._reports.pop(slot, None)
+            time.sleep(self.RESTART_DELAY_SECS)
+            self._spawn(slot)
+
+    def _drain_stats(self, timeout):
+        try:
+            slot, stats = self._queue.get(timeout=timeout)
+            self._reports[slot] = stats
+            while True:
+                slot, stats = self._queue.get_nowait()
+                self._reports[slot] = stats
+        except queue.Empty:
+            pass
+
+    def stats(self):
+        """Get stats combined across the latest report of each worker."""
+        return merge_stats(self._reports.values())
+
+    def report(self):
+        """Log combined worker stats."""
+        log.info("%d/%d workers reporting: %s", len(self._reports),
+                 self._count, self.stats())
+
+    def _stop(self, signum, frame):
+        #pylint: disable=unused-argument
+        log.info("received signal %d; stopping workers", signum)
+        self._running = False
+
+    def _shutdown(self):
+        for proc in self._workers.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in self._workers.values():
+            proc.join(10)
+        self.report()
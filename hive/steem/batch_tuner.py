@@ -0,0 +1,144 @@
+"""Adaptive batch size and concurrency for batched steemd calls."""
+
+import logging
+import threading
+
+from hive.utils.stats import SteemStats
+
+log = logging.getLogger(__name__)
+
+class BatchTuner:
+    """Tunes one method's batch size and worker count from throughput.
+
+    Tuning starts small and hill-climbs on measured throughput (items
+    per second over all workers). Each window of `WINDOW` calls at the
+    current setting is compared to the last: a probe step (growing the
+    batch by `GROWTH`, or adding a worker) is kept if throughput rose by
+    over `GAIN`, and undone otherwise. Probes alternate between the two;
+    once neither helps, the setting is held for `HOLD` windows before
+    probing again, so it follows changing node conditions.
+
+    A call which needed retries halves both batch size and workers
+    (AIMD backoff). The configured maximums are hard caps only.
+    Running over par (see `SteemStats.PAR_STEEMD`) is logged, once per
+    slow spell.
+    """
+
+    START_BATCH = 10
+    WINDOW = 3
+    GROWTH = 1.5
+    GAIN = 0.05
+    HOLD = 20
+
+    def __init__(self, method, max_batch, max_workers):
+        assert max_batch > 0 and max_workers > 0
+        par = 'get_blocks_batch' if method == 'get_block' else method
+        self.method = method
+        self.max_batch = max_batch
+        self.max_workers = max_workers
+        self.batch_size = min(max_batch, self.START_BATCH)
+        self.workers = 1
+        self._par_ms = SteemStats.PAR_STEEMD.get(par)
+        self._slow = False
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._samples = []   # secs per item of calls at current setting
+        self._rate = None    # throughput at current setting
+        self._probe = None   # (setting, rate) before the step under test
+        self._knob = 'batch'
+        self._misses = 0     # probes in a row which did not help
+        self._hold = 0
+
+    def report(self, items, secs, tries=1):
+        """Adjust after a call of `items` which took `secs` and `tries`."""
+        with self._lock:
+            slow = self._over_par(items, secs)
+            if slow and not self._slow:
+                log.warning("[STEEM] %s: %.1fs for %d items, over par",
+                            self.method, secs, items)
+            self._slow = slow
+
+            if tries > 1:
+                self._reset()
+                self._set(self.batch_size // 2, self.workers // 2,
+                          "%d tries" % tries)
+                return
+
+            # partial chunks and calls sent before the last change
+            # do not measure the current setting
+            if items != self.batch_size or not secs:
+                return
+            self._samples.append(secs / items)
+            if len(self._samples) < self.WINDOW:
+                return
+            rate = self.workers * len(self._samples) / sum(self._samples)
+            self._samples = []
+            self._adjust(rate)
+
+    def _adjust(self, rate):
+        """Evaluate the window just measured at `rate`; pick next step."""
+        if self._probe:
+            (batch_size, workers), before = self._probe
+            self._probe = None
+            if rate <= before * (1 + self.GAIN):
+                # no gain: undo, then re-measure before probing the other
+                self._set(batch_size, workers)
+                self._rate = before
+                self._miss()
+                return
+            self._misses = 0
+        elif self._hold:
+            self._hold -= 1
+            self._rate = rate
+            return
+
+        self._rate = rate
+        self._step()
+
+    def _step(self):
+        """Start a probe step of the current knob, if not at its cap."""
+        if self._knob == 'batch':
+            batch_size = min(self.max_batch,
+                             max(self.batch_size + 1, int(self.batch_size * self.GROWTH)))
+            step = (batch_size, self.workers)
+        else:
+            step = (self.batch_size, min(self.max_workers, self.workers + 1))
+        if step == (self.batch_size, self.workers):
+            self._miss()
+            return
+        self._probe = ((self.batch_size, self.workers), self._rate)
+        self._set(*step)
+
+    def _miss(self):
+        """Switch knobs; hold the setting once neither improves."""
+        self._knob = 'workers' if self._knob == 'batch' else 'batch'
+        self._misses += 1
+        if self._misses >= 2:
+            self._misses = 0
+            self._hold = self.HOLD
+            log.info("[STEEM] %s: settled at batch %d, workers %d (%d items/s)",
+                     self.method, self.batch_size, self.workers, self._rate)
+
+    def _over_par(self, items, secs):
+        if not self._par_ms:
+            return False
+        per = (secs * 1000 - SteemStats.PAR_HTTP_OVERHEAD) / items
+        return per > self._par_ms * SteemStats.PAR_THRESHOLD
+
+    def _set(self, batch_size, workers, reason=None):
+        batch_size = min(self.max_batch, max(1, batch_size))
+        workers = min(self.max_workers, max(1, workers))
+        if (batch_size, workers) == (self.batch_size, self.workers):
+            return
+        if reason:
+            log.info("[STEEM] %s: batch %d -> %d, workers %d -> %d (%s)",
+                     self.method, self.batch_size, batch_size,
+                     self.workers, workers, reason)
+        else:
+            log.debug("[STEEM] %s: batch %d -> %d, workers %d -> %d",
+                      self.method, self.batch_size, batch_size,
+                      self.workers, workers)
+        self.batch_size = batch_size
+        self.workers = workers
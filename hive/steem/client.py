@@ -12,19 +12,20 @@ class SteemClient:
     """Handles upstream calls to jussi/steemd, with batching and retrying."""
 
     def __init__(self, url='https://api.steemit.com', max_batch=50, max_workers=1):
+        """`url` may list several comma-separated endpoints."""
         assert url, 'steem-API endpoint undefined'
         assert max_batch > 0 and max_batch <= 5000
         assert max_workers > 0 and max_workers <= 64
 
         self._max_batch = max_batch
         self._max_workers = max_workers
-        self._client = HttpClient(nodes=[url])
+        self._client = HttpClient(nodes=[node for node in url.split(',') if node])
 
     def get_accounts(self, accounts):
         """Fetch multiple accounts by name."""
         assert accounts, "no accounts passed to get_accounts"
         assert len(accounts) <= 1000, "max 1000 accounts"
-        ret = self.__exec('get_accounts', [accounts])
+        ret = self.__exec_batch('get_accounts', accounts, batch_size=1000)
         assert len(accounts) == len(ret), ("requested %d accounts got %d"
                                            % (len(accounts), len(ret)))
         return ret
@@ -140,8 +141,10 @@ class SteemClient:
         Stats.log_steem(method, perf() - start, items)
         return result
 
-    def __exec_batch(self, method, params):
-        """Perform batch call. Based on config uses either batch or futures."""
+    def __exec_batch(self, method, params, batch_size=None):
+        """Perform batch call. Based on config uses either batch or futures.
+
+        `batch_size` overrides the configured cap on chunk size."""
         start = perf()
 
         result = []
@@ -149,7 +152,7 @@ class SteemClient:
                 method,
                 params,
                 max_workers=self._max_workers,
-                batch_size=self._max_batch):
+                batch_size=batch_size or self._max_batch):
             result.extend(part)
 
         Stats.log_steem(method, perf() - start, len(params))
@@ -1,11 +1,10 @@
 # coding=utf-8
 """Simple HTTP client for communicating with jussi/steem."""
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import logging
 import socket
-from functools import partial
-from itertools import cycle
 from time import sleep, perf_counter as perf
 import ujson as json
 
@@ -17,6 +16,8 @@ from urllib3.connection import HTTPConnection
 from urllib3.exceptions import HTTPError
 
 from hive.steem.exceptions import RPCError, RPCErrorFatal
+from hive.steem.node_pool import NodePool
+from hive.steem.batch_tuner import BatchTuner
 
 logging.getLogger('urllib3.connectionpool').setLevel(logging.WARNING)
 log = logging.getLogger(__name__)
@@ -79,7 +80,13 @@ def _rpc_body(method, args, _id=0):
     return dict(jsonrpc="2.0", id=_id, method=method, params=args)
 
 class HttpClient(object):
-    """Simple Steem JSON-HTTP-RPC API"""
+    """Simple Steem JSON-HTTP-RPC API
+
+    Requests are routed among `nodes` by a `NodePool`. With more than
+    one node, a request which runs past the recent p95 latency of its
+    method (scaled to its batch size) is hedged: a duplicate goes to another node and the first valid
+    response wins.
+    """
 
     METHOD_API = dict(
         lookup_accounts='condenser_api',
@@ -91,6 +98,10 @@ class HttpClient(object):
         get_dynamic_global_properties='database_api',
     )
 
+    # methods taking a list of items in a single call, rather than
+    # being batched as one JSON-RPC request per item
+    LIST_METHODS = ('get_accounts',)
+
     def __init__(self, nodes, **kwargs):
         if kwargs.get('tcp_keepalive', True):
             socket_options = HTTPConnection.default_socket_options + \
@@ -111,21 +122,64 @@ class HttpClient(object):
             cert_reqs='CERT_REQUIRED',
             ca_certs=certifi.where())
 
-        self.nodes = cycle(nodes)
-        self.url = ''
-        self.request = None
-        self.next_node()
-
-    def next_node(self):
-        """Switch to the next available node."""
-        self.set_node(next(self.nodes))
-
-    def set_node(self, node_url):
-        """Change current node to provided node URL."""
-        if not self.url == node_url:
-            log.info("using node: %s", node_url)
-            self.url = node_url
-            self.request = partial(self.http.urlopen, 'POST', self.url)
+        self.nodes = NodePool(nodes)
+        self._tuners = {}
+        log.info("using nodes: %s", ', '.join(nodes))
+
+        # runs hedged requests; idle threads are only spawned on demand
+        self._hedger = None
+        if len(self.nodes) > 1:
+            self._hedger = ThreadPoolExecutor(max_workers=2 * kwargs.get('maxsize', 64))
+
+    def _request(self, url, body, body_data, method, items):
+        """POST a request of `items` to `url` and validate it, reporting
+        to pool.
+
+        Returns `(result, info)`."""
+        start = perf()
+        ok = False
+        try:
+            response = self.http.urlopen('POST', url, body=body_data)
+            info = {'node': url,
+                    'jussi-id': response.headers.get('x-jussi-request-id'),
+                    'secs': round(perf() - start, 3)}
+
+            # strict validation/asserts, error check
+            payload = validated_json_payload(response)
+            result = validated_result(payload, body)
+            ok = True
+            return (result, info)
+        except RPCErrorFatal:
+            ok = True # node is fine; request is bad
+            raise
+        finally:
+            self.nodes.report(url, perf() - start, ok, method, items)
+
+    def _hedged_request(self, body, body_data, method, items):
+        """Send request to the best node; if it runs past the hedge
+        delay, race a duplicate against it on another node."""
+        url = self.nodes.pick()
+        delay = self._hedger and self.nodes.hedge_delay(method, items)
+        if not delay:
+            return self._request(url, body, body_data, method, items)
+
+        first = self._hedger.submit(self._request, url, body, body_data,
+                                    method, items)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        backup = self.nodes.pick(exclude=(url,))
+        pending = [first, self._hedger.submit(self._request, backup, body,
+                                              body_data, method, items)]
+        log.info("hedging request to %s after %.2fs, via %s", url, delay, backup)
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if not future.exception():
+                    return future.result()
+            if not pending:
+                return done.pop().result()
 
     def rpc_body(self, method, args, is_batch=False):
         """Build JSON request body for steemd RPC requests."""
@@ -140,7 +194,14 @@ class HttpClient(object):
 
     def exec(self, method, args, is_batch=False):
         """Execute a steemd RPC method, retrying on failure."""
-        what = "%s[%d]" % (method, len(args) if is_batch else 1)
+        return self._exec(method, args, is_batch)[0]
+
+    def _exec(self, method, args, is_batch=False):
+        """Execute a steemd RPC method; returns `(result, tries)`."""
+        items = len(args) if is_batch else 1
+        if method in self.LIST_METHODS:
+            items = len(args[0])
+        what = "%s[%d]" % (method, items)
         body = self.rpc_body(method, args, is_batch)
         body_data = json.dumps(body, ensure_ascii=False).encode('utf8')
 
@@ -151,23 +212,16 @@ class HttpClient(object):
             info = None
             try:
                 start = perf()
-                response = self.request(body=body_data)
+                result, info = self._hedged_request(body, body_data, method, items)
                 secs = perf() - start
-
-                info = {'jussi-id': response.headers.get('x-jussi-request-id'),
-                        'secs': round(secs, 3),
-                        'try': tries}
-
-                # strict validation/asserts, error check
-                payload = validated_json_payload(response)
-                result = validated_result(payload, body)
+                info['try'] = tries
 
                 if secs > 5:
                     log.warning('%s took %.1fs %s', what, secs, info)
                 if tries > 1:
                     log.warning('%s took %d tries %s', what, tries, info)
 
-                return result
+                return (result, tries)
 
             except (AssertionError, RPCErrorFatal) as e:
                 raise e
@@ -175,7 +229,8 @@ class HttpClient(object):
             except (Exception, socket.timeout) as e:
                 if secs < 0: # request failed
                     secs = perf() - start
-                    info = {'secs': round(secs, 3), 'try': tries}
+                    info = {'secs': round(secs, 3), 'try': tries,
+                            'nodes': self.nodes.status()}
                 if tries > 1:
                     log.warning('%s failed in %.1fs. try %d. %s - %s',
                                 what, secs, tries, info, repr(e))
@@ -183,18 +238,40 @@ class HttpClient(object):
                     log.info('%s failed in %.1fs. try %d. %s - %s',
                              what, secs, tries, info, repr(e))
 
-            if tries % 2 == 0:
-                self.next_node()
             sleep(tries / 10)
 
         raise Exception("abort %s after %d tries" % (method, tries))
 
     def exec_multi(self, name, params, max_workers, batch_size):
-        """Process a batch as parallel requests."""
-        chunks = [[name, args, True] for args in chunkify(params, batch_size)]
+        """Process a batch as parallel requests.
+
+        `max_workers` and `batch_size` are hard caps; the chunk size
+        and number of requests in flight are tuned per method from
+        observed throughput and retries (see `BatchTuner`). Chunks of
+        `LIST_METHODS` are sent as one call taking the list of items."""
+        tuner = self._tuners.get(name)
+        if not tuner or (tuner.max_batch, tuner.max_workers) != (batch_size, max_workers):
+            tuner = self._tuners[name] = BatchTuner(name, batch_size, max_workers)
+
+        params = list(params)
+        pos = 0
+        pending = deque()
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            for items in executor.map(lambda tup: self.exec(*tup), chunks):
-                yield list(items) # (use of `map` preserves request order)
+            while pos < len(params) or pending:
+                while pos < len(params) and len(pending) < tuner.workers:
+                    chunk = params[pos:pos + tuner.batch_size]
+                    pos += len(chunk)
+                    pending.append(executor.submit(self._exec_tuned, tuner, name, chunk))
+                yield list(pending.popleft().result()) # preserves request order
+
+    def _exec_tuned(self, tuner, name, args):
+        start = perf()
+        if name in self.LIST_METHODS:
+            result, tries = self._exec(name, [args])
+        else:
+            result, tries = self._exec(name, args, True)
+        tuner.report(len(args), perf() - start, tries)
+        return result
 
     def exec_multi_as_completed(self, name, params, max_workers, batch_size):
         """Process a batch as parallel requests; yields unordered."""
@@ -0,0 +1,120 @@
+"""Health and latency tracking for a set of upstream steemd nodes."""
+
+import logging
+import threading
+from collections import deque
+from time import monotonic
+
+log = logging.getLogger(__name__)
+
+class _Node:
+    """State of a single upstream node."""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, url, latency):
+        self.url = url
+        self.latency = latency  # EWMA of request time per item, secs
+        self.inflight = 0
+        self.failures = 0       # consecutive
+        self.open_until = 0.0   # circuit breaker open while in future
+        self.cooldown = 0.0
+
+class NodePool:
+    """Routes requests among nodes by observed latency and health.
+
+    Each node keeps an EWMA of its request times per item (batched
+    calls count each element). `pick` chooses the
+    available node with the lowest expected wait, taking requests
+    already in flight into account, so parallel calls spread out over
+    fast nodes. After `FAIL_THRESHOLD` consecutive failures a node's
+    circuit breaker opens and it is skipped for a cooldown which doubles
+    on each re-trip; once it passes, the node is tried again.
+
+    `hedge_delay` gives the recent p95 time per item of a method, scaled
+    to a request's size, after which a caller may send a duplicate
+    request to another node.
+    """
+
+    ALPHA = 0.2
+    INITIAL_LATENCY = 0.5
+    FAIL_THRESHOLD = 3
+    MIN_COOLDOWN = 5.0
+    MAX_COOLDOWN = 300.0
+    MIN_SAMPLES = 20
+
+    def __init__(self, urls, clock=monotonic):
+        urls = [url for url in urls if url]
+        assert urls, 'no nodes provided'
+        assert len(set(urls)) == len(urls), 'duplicate node urls'
+        self._nodes = {url: _Node(url, self.INITIAL_LATENCY) for url in urls}
+        self._order = urls
+        self._samples = {}  # method -> recent secs per item
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._order)
+
+    def pick(self, exclude=()):
+        """Choose a node and mark a request in flight on it.
+
+        Nodes with an open breaker are only used if no other is left;
+        returns None if every node is excluded."""
+        with self._lock:
+            now = self._clock()
+            cands = [self._nodes[url] for url in self._order if url not in exclude]
+            if not cands:
+                return None
+            ready = [node for node in cands if node.open_until <= now]
+            if ready:
+                node = min(ready, key=lambda n: n.latency * (1 + n.inflight))
+            else:
+                node = min(cands, key=lambda n: n.open_until)
+            node.inflight += 1
+            return node.url
+
+    def report(self, url, secs, ok, method=None, items=1):
+        """Record the outcome of a request of `items` started with `pick`."""
+        secs = secs / max(1, items)
+        with self._lock:
+            node = self._nodes[url]
+            node.inflight = max(0, node.inflight - 1)
+            if ok:
+                node.latency += self.ALPHA * (secs - node.latency)
+                if method not in self._samples:
+                    self._samples[method] = deque(maxlen=200)
+                self._samples[method].append(secs)
+                if node.failures >= self.FAIL_THRESHOLD:
+                    log.info("node %s recovered", url)
+                node.failures = 0
+                node.cooldown = 0.0
+                return
+
+            # failures count towards latency so flaky nodes score worse
+            node.latency += self.ALPHA * (max(secs, node.latency * 2) - node.latency)
+            node.failures += 1
+            if node.failures >= self.FAIL_THRESHOLD:
+                node.cooldown = min(self.MAX_COOLDOWN,
+                                    max(self.MIN_COOLDOWN, node.cooldown * 2))
+                node.open_until = self._clock() + node.cooldown
+                log.warning("node %s failed %d times; skipping for %ds",
+                            url, node.failures, node.cooldown)
+
+    def hedge_delay(self, method=None, items=1):
+        """Recent p95 time of a `method` call of `items`, or None if unknown."""
+        with self._lock:
+            samples = self._samples.get(method, ())
+            if len(samples) < self.MIN_SAMPLES:
+                return None
+            samples = sorted(samples)
+        return samples[int(len(samples) * 0.95) - 1] * max(1, items)
+
+    def status(self):
+        """Per-node summary for logging."""
+        now = self._clock()
+        with self._lock:
+            return {url: dict(latency=round(node.latency, 3),
+                              inflight=node.inflight,
+                              failures=node.failures,
+                              available=node.open_until <= now)
+                    for url, node in self._nodes.items()}
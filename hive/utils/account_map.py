@@ -0,0 +1,134 @@
+"""Compact account name -> id map, with memory-mappable snapshots."""
+
+import mmap
+import os
+import struct
+from array import array
+
+class AccountMap:
+    """Maps account names to ids using flat arrays instead of a dict.
+
+    Names are kept sorted in a single bytes buffer, delimited by an
+    offsets array, with ids in a parallel int32 array; lookups are a
+    binary search. Accounts added later go to a small overlay dict,
+    which is folded in on the next snapshot.
+
+    Snapshots are read through mmap, so loading one is O(1) and pages
+    are shared with the OS cache. Arrays are stored in native byte order.
+    """
+
+    MAGIC = b'HIVEACC1'
+    # magic, count, names length, max id; padded to 32 bytes
+    HEADER = struct.Struct('<8sIII12x')
+
+    def __init__(self, names=b'', offsets=None, ids=None, max_id=None, base=0):
+        self._names = names # sorted names, starting at `base`
+        self._base = base
+        self._offsets = offsets if offsets is not None else array('I', [0])
+        self._ids = ids if ids is not None else array('i')
+        self._count = len(self._ids)
+        if max_id is None:
+            max_id = max(self._ids) if self._count else 0
+        self._max_id = max_id
+        self._extra = {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from `(name, id)` pairs."""
+        rows = sorted((name.encode('utf8'), _id) for name, _id in rows)
+        offsets = array('I', [0])
+        pos = 0
+        for name, _ in rows:
+            pos += len(name)
+            offsets.append(pos)
+        return cls(b''.join(name for name, _ in rows), offsets,
+                   array('i', (_id for _, _id in rows)))
+
+    def _find(self, name):
+        """Binary search sorted names; return id or None."""
+        key = name.encode('utf8')
+        names, offsets, base = self._names, self._offsets, self._base
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = names[base + offsets[mid]:base + offsets[mid + 1]]
+            if cur < key:
+                lo = mid + 1
+            elif cur > key:
+                hi = mid
+            else:
+                return self._ids[mid]
+        return None
+
+    def get(self, name):
+        """Get id for `name`, or None."""
+        _id = self._extra.get(name)
+        if _id is None:
+            _id = self._find(name)
+        return _id
+
+    def add(self, name, _id):
+        """Add a new account."""
+        self._extra[name] = _id
+        if _id > self._max_id:
+            self._max_id = _id
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __len__(self):
+        return self._count + len(self._extra)
+
+    @property
+    def max_id(self):
+        """Highest account id in the map."""
+        return self._max_id
+
+    @property
+    def overlay_size(self):
+        """Number of accounts added since the map was built or loaded."""
+        return len(self._extra)
+
+    def items(self):
+        """Iterate over all `(name, id)` pairs."""
+        names, offsets, base = self._names, self._offsets, self._base
+        for i in range(self._count):
+            name = names[base + offsets[i]:base + offsets[i + 1]]
+            yield (name.decode('utf8'), self._ids[i])
+        yield from self._extra.items()
+
+    def save(self, path):
+        """Write a snapshot (including overlay) to `path`, atomically."""
+        # pylint: disable=protected-access
+        merged = self if not self._extra else AccountMap.from_rows(self.items())
+        names_len = merged._offsets[merged._count]
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, merged._count, names_len,
+                                     merged._max_id))
+            f.write(memoryview(merged._offsets).cast('B'))
+            f.write(memoryview(merged._ids).cast('B'))
+            f.write(merged._names[merged._base:merged._base + names_len])
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Map a snapshot written by `save`. Raises ValueError if invalid."""
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buf) < cls.HEADER.size:
+            raise ValueError('truncated account map snapshot')
+        magic, count, names_len, max_id = cls.HEADER.unpack_from(buf)
+        if magic != cls.MAGIC:
+            raise ValueError('not an account map snapshot')
+
+        pos = cls.HEADER.size
+        offsets_end = pos + 4 * (count + 1)
+        ids_end = offsets_end + 4 * count
+        if len(buf) != ids_end + names_len:
+            raise ValueError('account map snapshot size mismatch')
+
+        view = memoryview(buf)
+        offsets = view[pos:offsets_end].cast('I')
+        ids = view[offsets_end:ids_end].cast('i')
+        return cls(buf, offsets, ids, max_id=max_id, base=ids_end)
@@ -0,0 +1,134 @@
+"""Scalable Bloom filter for fast negative membership checks."""
+
+import math
+import os
+import struct
+from hashlib import blake2b
+
+class ScalableBloomFilter:
+    """Bloom filter which grows as items are added.
+
+    Items go into the newest of a series of plain Bloom filters
+    ("stages"); when it reaches capacity a stage twice as large is added
+    with a tighter error rate, so the compounded false positive rate
+    stays under `error_rate` (Almeida et al., 2007). Membership is
+    checked against all stages; there are no false negatives.
+
+    `watermark` is a caller-defined position (e.g. last added row id)
+    which is persisted along with the filter by `save`.
+    """
+
+    MAGIC = b'HIVEBLM1'
+    # magic, error rate, initial capacity, stage count, watermark
+    HEADER = struct.Struct('<8sdQIq')
+    # capacity, count, hash count, bit count
+    STAGE = struct.Struct('<QQIQ')
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, capacity=1000000, error_rate=0.01):
+        assert capacity > 0 and 0 < error_rate < 1
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._stages = []
+        self.watermark = 0
+
+    def _add_stage(self):
+        n = len(self._stages)
+        capacity = self._capacity * self.GROWTH ** n
+        err = self._error_rate * (1 - self.TIGHTENING) * self.TIGHTENING ** n
+        k = max(1, math.ceil(math.log2(1 / err)))
+        m = math.ceil(capacity * k / math.log(2))
+        self._stages.append([capacity, 0, k, m, bytearray((m + 7) // 8)])
+
+    @staticmethod
+    def _hashes(item):
+        digest = blake2b(item.encode('utf8'), digest_size=16).digest()
+        return (int.from_bytes(digest[:8], 'little'),
+                int.from_bytes(digest[8:], 'little') | 1)
+
+    @staticmethod
+    def _probe(stage, h1, h2):
+        _, _, k, m, bits = stage
+        for i in range(k):
+            bit = (h1 + i * h2) % m
+            if not bits[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def __contains__(self, item):
+        h1, h2 = self._hashes(item)
+        for stage in self._stages:
+            if self._probe(stage, h1, h2):
+                return True
+        return False
+
+    def add(self, item):
+        """Add an item. Returns False if it was (probably) present."""
+        h1, h2 = self._hashes(item)
+        for stage in self._stages:
+            if self._probe(stage, h1, h2):
+                return False
+        if not self._stages or self._stages[-1][1] >= self._stages[-1][0]:
+            self._add_stage()
+        stage = self._stages[-1]
+        _, _, k, m, bits = stage
+        for i in range(k):
+            bit = (h1 + i * h2) % m
+            bits[bit >> 3] |= 1 << (bit & 7)
+        stage[1] += 1
+        return True
+
+    def __len__(self):
+        return sum(stage[1] for stage in self._stages)
+
+    @property
+    def nbytes(self):
+        """Memory used by filter bits."""
+        return sum(len(stage[4]) for stage in self._stages)
+
+    def est_error_rate(self):
+        """Estimated false positive rate given the current fill."""
+        miss = 1.0
+        for _, count, k, m, _ in self._stages:
+            miss *= 1 - (1 - math.exp(-k * count / m)) ** k
+        return 1 - miss
+
+    def save(self, path):
+        """Write filter to `path`, atomically."""
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self._error_rate,
+                                     self._capacity, len(self._stages),
+                                     self.watermark))
+            for capacity, count, k, m, bits in self._stages:
+                f.write(self.STAGE.pack(capacity, count, k, m))
+                f.write(bits)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a filter written by `save`. Raises ValueError if invalid."""
+        with open(path, 'rb') as f:
+            try:
+                magic, err, capacity, nstages, watermark = cls.HEADER.unpack(
+                    f.read(cls.HEADER.size))
+            except struct.error as e:
+                raise ValueError('truncated bloom filter') from e
+            if magic != cls.MAGIC:
+                raise ValueError('not a bloom filter snapshot')
+            bloom = cls(capacity, err)
+            bloom.watermark = watermark
+            for _ in range(nstages):
+                try:
+                    cap, count, k, m = cls.STAGE.unpack(f.read(cls.STAGE.size))
+                except struct.error as e:
+                    raise ValueError('truncated bloom filter') from e
+                bits = bytearray(f.read((m + 7) // 8))
+                if len(bits) != (m + 7) // 8:
+                    raise ValueError('truncated bloom filter')
+                bloom._stages.append([cap, count, k, m, bits])
+            if f.read(1):
+                raise ValueError('bloom filter size mismatch')
+        return bloom
@@ -0,0 +1,153 @@
+"""Compact cache of core post metadata, keyed by author/permlink."""
+
+from array import array
+from hashlib import blake2b
+
+class PostMetaCache:
+    """Bounded `author/permlink -> post metadata` map in flat arrays.
+
+    Entries hold `(id, depth, is_deleted, root_id, category, community)`;
+    category and community strings are interned to ints. Keys are 64-bit
+    hashes of the url, stored in an open-addressing table (linear probing)
+    sized to twice the capacity. When full, an entry is evicted using
+    CLOCK: a hand sweeps the table, clearing reference bits, and takes
+    the first entry which was not read since the last pass.
+
+    At ~30 bytes per slot this is far smaller than a dict of url strings.
+    """
+
+    _EMPTY = 0
+    _REF = 1
+    _DELETED = 2
+
+    def __init__(self, size):
+        assert size > 0, 'cache size must be positive'
+        cap = 1
+        while cap < 2 * size:
+            cap <<= 1
+        self._size = size
+        self._mask = cap - 1
+        self._count = 0
+        self._hand = 0
+
+        self._keys = array('q', bytes(8 * cap))
+        self._ids = array('i', bytes(4 * cap))
+        self._roots = array('i', bytes(4 * cap))
+        self._cats = array('i', bytes(4 * cap))
+        self._comms = array('i', bytes(4 * cap))
+        self._depths = array('H', bytes(2 * cap))
+        self._flags = array('B', bytes(cap))
+
+        self._strs = []
+        self._str_idx = {}
+
+        self.hits = 0
+        self.miss = 0
+
+    @staticmethod
+    def _hash(author, permlink):
+        url = (author + '/' + permlink).encode('utf8')
+        key = int.from_bytes(blake2b(url, digest_size=8).digest(),
+                             'little', signed=True)
+        return key or 1 # 0 marks empty slots
+
+    def _intern(self, val):
+        idx = self._str_idx.get(val)
+        if idx is None:
+            idx = len(self._strs)
+            self._strs.append(val)
+            self._str_idx[val] = idx
+        return idx
+
+    def _slot(self, key):
+        """Find the slot holding `key`, or the empty slot ending its run."""
+        keys, mask = self._keys, self._mask
+        i = key & mask
+        while keys[i] != self._EMPTY and keys[i] != key:
+            i = (i + 1) & mask
+        return i
+
+    def get(self, author, permlink):
+        """Get `(id, depth, is_deleted, root_id, category, community)`
+        of a post, or None if not cached."""
+        i = self._slot(self._hash(author, permlink))
+        if self._keys[i] == self._EMPTY:
+            self.miss += 1
+            return None
+        self.hits += 1
+        flags = self._flags[i] | self._REF
+        self._flags[i] = flags
+        return (self._ids[i], self._depths[i], bool(flags & self._DELETED),
+                self._roots[i], self._strs[self._cats[i]],
+                self._strs[self._comms[i]])
+
+    def put(self, author, permlink, pid, depth, is_deleted, root_id,
+            category, community):
+        """Insert or replace a post's entry."""
+        key = self._hash(author, permlink)
+        i = self._slot(key)
+        ref = self._flags[i] & self._REF
+        if self._keys[i] == self._EMPTY:
+            if self._count >= self._size:
+                self._evict()
+                i = self._slot(key)
+            self._keys[i] = key
+            self._count += 1
+            ref = 0 # new entries only survive a sweep once read
+        self._ids[i] = pid
+        self._depths[i] = depth
+        self._roots[i] = root_id
+        self._cats[i] = self._intern(category)
+        self._comms[i] = self._intern(community)
+        self._flags[i] = ref | (self._DELETED if is_deleted else 0)
+
+    def set_deleted(self, author, permlink, is_deleted=True):
+        """Update the deleted flag of a cached post, if present."""
+        i = self._slot(self._hash(author, permlink))
+        if self._keys[i] != self._EMPTY:
+            if is_deleted:
+                self._flags[i] |= self._DELETED
+            else:
+                self._flags[i] &= ~self._DELETED & 0xff
+
+    def clear(self):
+        """Drop all entries."""
+        self.__init__(self._size)
+
+    def _evict(self):
+        """Remove one entry, chosen by CLOCK."""
+        keys, flags, mask = self._keys, self._flags, self._mask
+        while True:
+            i = self._hand
+            self._hand = (i + 1) & mask
+            if keys[i] == self._EMPTY:
+                continue
+            if flags[i] & self._REF:
+                flags[i] &= ~self._REF & 0xff
+                continue
+            self._remove(i)
+            return
+
+    def _remove(self, i):
+        """Empty slot `i`, shifting back later entries of its probe run."""
+        keys, mask = self._keys, self._mask
+        cols = (self._keys, self._ids, self._roots, self._cats,
+                self._comms, self._depths, self._flags)
+        j = i
+        while True:
+            j = (j + 1) & mask
+            if keys[j] == self._EMPTY:
+                break
+            home = keys[j] & mask
+            # keep entry j if its home lies cyclically in (i, j]
+            if (i < j and i < home <= j) or (j < i and (home > i or home <= j)):
+                continue
+            for col in cols:
+                col[i] = col[j]
+            i = j
+        keys[i] = self._EMPTY
+        self._flags[i] = 0
+        self._count -= 1
+
+    def __len__(self):
+        return self._count
@@ -42,7 +42,7 @@ setup(
         'configargparse',
         'pdoc',
     ],
-    extras_require={'test': tests_require},
+    extras_require={'test': tests_require, 'asyncpg': ['asyncpg']},
     entry_points={
         'console_scripts': [
             'hive=hive.cli:run',
@@ -0,0 +1,46 @@
+#pylint: disable=missing-docstring
+import struct
+import pytest
+from hive.server.common.keyset import encode, decode
+
+def _real(value):
+    """Round a float to REAL (float4), as stored by the db."""
+    return struct.unpack('f', struct.pack('f', value))[0]
+
+# (sc_trend, post_id) rows as read back from a REAL column, with ties
+ROWS = sorted([(_real(score), pid) for pid, score in enumerate(
+    [0.1, 0.1, 0.1, 1 / 3, 1 / 3, 2.2, 2.2, 7.7, 12345.678, 12345.678,
+     0.3, 0.7, 1e-7, 1e-7, 98765.4321, 5.5, 5.5, 5.5, 0.2, 0.9], 1)],
+              reverse=True)
+
+def _seek(rows, cursor, limit):
+    """Emulate `(sc_trend, post_id) <= (CAST(:value AS REAL), :id)`."""
+    if cursor:
+        value, key = decode(cursor, 'trending')
+        rows = [r for r in rows if r <= (_real(value), key)]
+    return rows[:limit]
+
+@pytest.mark.parametrize('limit', [2, 3, 4, 7])
+def test_keyset_pages_across_ties(limit):
+    seen = []
+    cursor = None
+    while True:
+        page = _seek(ROWS, cursor, limit)
+        # like condenser clients, drop the resumed-at row of later pages
+        seen.extend(page[1:] if cursor else page)
+        if len(page) < limit:
+            break
+        cursor = encode('trending', *page[-1])
+    assert seen == ROWS
+
+def test_keyset_real_cursor_exact():
+    for score, pid in ROWS:
+        value, key = decode(encode('trending', score, pid), 'trending')
+        assert (_real(value), key) == (score, pid)
+
+def test_keyset_scope_and_garbage():
+    token = encode('hot', 1.5, 3)
+    with pytest.raises(AssertionError):
+        decode(token, 'trending')
+    with pytest.raises(AssertionError):
+        decode('not-a-cursor', 'hot')
@@ -0,0 +1,70 @@
+#pylint: disable=missing-docstring
+import pytest
+import ujson as json
+from hive.server.common.post_cache import PostCache
+
+def _post(pid, body='body'):
+    return {'post_id': pid, 'body': body, 'active_votes': [{'voter': 'alice'}]}
+
+def test_post_cache_requires_size():
+    with pytest.raises(AssertionError):
+        PostCache(0)
+
+def test_post_cache_version():
+    cache = PostCache(10)
+    cache.put(1, 'v1', _post(1))
+    assert cache.get(1, 'v1') == _post(1)
+    assert cache.get(1, 'v2') is None
+    assert cache.get(2, 'v1') is None
+
+    # a new version replaces the old one
+    cache.put(1, 'v2', _post(1, 'edited'))
+    assert cache.get(1, 'v1') is None
+    assert cache.get(1, 'v2')['body'] == 'edited'
+    assert len(cache) == 1
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 3)
+    assert stats['hit_rate'] == 0.4
+
+def test_post_cache_eviction_order():
+    cache = PostCache(3)
+    for pid in (1, 2, 3):
+        cache.put(pid, 'v', _post(pid))
+    assert cache.get(1, 'v') # 1 becomes most recently used
+    cache.put(4, 'v', _post(4))
+    assert len(cache) == 3
+    assert cache.get(2, 'v') is None
+    assert cache.get(1, 'v') and cache.get(3, 'v') and cache.get(4, 'v')
+
+    # re-putting refreshes recency; 1 is now the oldest
+    cache.put(3, 'v', _post(3))
+    cache.put(4, 'v', _post(4))
+    cache.put(5, 'v', _post(5))
+    assert cache.get(1, 'v') is None
+    assert cache.get(3, 'v') and cache.get(4, 'v') and cache.get(5, 'v')
+
+def test_post_cache_returns_copies():
+    cache = PostCache(10)
+    post = _post(1)
+    cache.put(1, 'v', post)
+    post['body'] = 'changed after put'
+
+    first = cache.get(1, 'v')
+    assert first['body'] == 'body'
+    first['body'] = first['body'][:1]
+    first['active_votes'].clear()
+
+    second = cache.get(1, 'v')
+    assert second == _post(1)
+    assert second is not first
+
+def test_post_cache_byte_accounting():
+    cache = PostCache(2)
+    cache.put(1, 'v', _post(1))
+    size = len(json.dumps(_post(1)))
+    assert cache._bytes == size #pylint: disable=protected-access
+    cache.put(1, 'v2', _post(1))
+    cache.put(2, 'v', _post(2))
+    cache.put(3, 'v', _post(3, 'x' * 1000))
+    assert cache._bytes == size + len(json.dumps(_post(3, 'x' * 1000))) #pylint: disable=protected-access
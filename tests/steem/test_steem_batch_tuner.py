@@ -0,0 +1,54 @@
+#pylint: disable=missing-docstring
+from hive.steem.batch_tuner import BatchTuner
+
+def _run(tuner, secs, calls=300):
+    """Report `calls` full batches timed by `secs(batch_size, workers)`."""
+    for _ in range(calls):
+        tuner.report(tuner.batch_size, secs(tuner.batch_size, tuner.workers))
+
+def test_batch_tuner_starts_small():
+    tuner = BatchTuner('get_content', 100, 8)
+    assert (tuner.batch_size, tuner.workers) == (BatchTuner.START_BATCH, 1)
+    tuner = BatchTuner('get_content', 5, 8)
+    assert tuner.batch_size == 5
+
+def test_batch_tuner_backoff_on_retries():
+    tuner = BatchTuner('get_content', 100, 8)
+    _run(tuner, lambda n, w: 0.075 + 0.001 * n)
+    assert tuner.batch_size > 50 and tuner.workers > 4
+    batch_size, workers = tuner.batch_size, tuner.workers
+    tuner.report(batch_size, 0.3, tries=3)
+    assert (tuner.batch_size, tuner.workers) == (batch_size // 2, workers // 2)
+    for _ in range(10):
+        tuner.report(10, 0.1, tries=2)
+    assert (tuner.batch_size, tuner.workers) == (1, 1)
+
+def test_batch_tuner_overhead_grows_to_cap():
+    # 75ms fixed + 6ms per item: bigger batches keep paying off, even
+    # though every call is over par
+    tuner = BatchTuner('get_block', 50, 4)
+    _run(tuner, lambda n, w: (75 + 6 * n) / 1000)
+    assert tuner.batch_size >= 45 and tuner.workers == 4
+
+def test_batch_tuner_finds_batch_optimum():
+    # per-item time is lowest at 50 items; large batches are slow
+    tuner = BatchTuner('get_accounts', 1000, 1)
+    _run(tuner, lambda n, w: 0.05 + 0.001 * n + 0.00002 * n * n)
+    assert 20 <= tuner.batch_size <= 120
+
+def test_batch_tuner_finds_worker_limit():
+    # node saturates beyond 3 concurrent calls
+    tuner = BatchTuner('get_content', 10, 16)
+    _run(tuner, lambda n, w: 0.1 * max(1, w / 3))
+    assert 3 <= tuner.workers <= 4
+
+def test_batch_tuner_ignores_partial_chunks():
+    tuner = BatchTuner('get_block', 50, 4)
+    for _ in range(20):
+        tuner.report(3, 0.1)
+    assert (tuner.batch_size, tuner.workers) == (BatchTuner.START_BATCH, 1)
+
+def test_batch_tuner_unknown_method():
+    tuner = BatchTuner('get_discussions', 10, 2)
+    _run(tuner, lambda n, w: 60.0)
+    assert tuner.batch_size == 10
@@ -0,0 +1,71 @@
+#pylint: disable=missing-docstring
+import pytest
+from hive.steem.node_pool import NodePool
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+    def __call__(self):
+        return self.now
+
+def test_node_pool_requires_nodes():
+    with pytest.raises(AssertionError):
+        NodePool([])
+    with pytest.raises(AssertionError):
+        NodePool(['http://a', 'http://a'])
+
+def test_node_pool_prefers_fast_node():
+    pool = NodePool(['http://slow', 'http://fast'])
+    for _ in range(10):
+        for url, secs in (('http://slow', 2.0), ('http://fast', 0.1)):
+            assert pool.pick(exclude=[u for u in ('http://slow', 'http://fast')
+                                      if u != url]) == url
+            pool.report(url, secs, True)
+    assert pool.pick() == 'http://fast'
+
+def test_node_pool_spreads_inflight():
+    pool = NodePool(['http://a', 'http://b'])
+    picked = {pool.pick(), pool.pick()}
+    assert picked == {'http://a', 'http://b'}
+
+def test_node_pool_circuit_breaker():
+    clock = Clock()
+    pool = NodePool(['http://a', 'http://b'], clock=clock)
+    for _ in range(NodePool.FAIL_THRESHOLD):
+        assert pool.pick(exclude=['http://b']) == 'http://a'
+        pool.report('http://a', 1.0, False)
+    assert not pool.status()['http://a']['available']
+
+    # only b is used while a's breaker is open
+    for _ in range(5):
+        url = pool.pick()
+        assert url == 'http://b'
+        pool.report(url, 5.0, True)
+
+    # if b is excluded, a is still used as a last resort
+    assert pool.pick(exclude=['http://b']) == 'http://a'
+    pool.report('http://a', 1.0, False)
+
+    # after the cooldown, a is tried again and recovers
+    clock.now += NodePool.MAX_COOLDOWN
+    assert pool.status()['http://a']['available']
+    pool.report(pool.pick(exclude=['http://b']), 0.1, True)
+    assert pool.status()['http://a']['failures'] == 0
+
+def test_node_pool_hedge_delay():
+    pool = NodePool(['http://a'])
+    assert pool.hedge_delay('get_block') is None
+    for i in range(100):
+        pool.report(pool.pick(), (i + 1) / 100, True, 'get_block')
+    assert pool.hedge_delay('get_block') == 0.95
+    assert pool.pick(exclude=['http://a']) is None
+
+def test_node_pool_hedge_delay_per_method_item():
+    pool = NodePool(['http://a'])
+    for _ in range(NodePool.MIN_SAMPLES):
+        pool.report(pool.pick(), 0.2, True, 'get_block')
+        pool.report(pool.pick(), 5.0, True, 'get_accounts', items=1000)
+    assert pool.hedge_delay('get_block') == 0.2
+    assert pool.hedge_delay('get_accounts', 1000) == 5.0
+    assert pool.hedge_delay('get_accounts', 10) == 0.05
+    assert pool.hedge_delay('get_content') is None
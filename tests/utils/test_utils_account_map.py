@@ -0,0 +1,55 @@
+#pylint: disable=missing-docstring
+import pytest
+from hive.utils.account_map import AccountMap
+
+ROWS = [('steemit', 1), ('alice', 7), ('bob', 3), ('zed', 12), ('ünï', 5)]
+
+def test_account_map_lookup():
+    amap = AccountMap.from_rows(ROWS)
+    assert len(amap) == 5
+    assert amap.max_id == 12
+    for name, _id in ROWS:
+        assert amap.get(name) == _id
+        assert name in amap
+    assert amap.get('carol') is None
+    assert 'aaa' not in amap
+    assert 'zzz' not in amap
+
+def test_account_map_empty():
+    amap = AccountMap()
+    assert not amap
+    assert amap.get('alice') is None
+    assert amap.max_id == 0
+
+def test_account_map_overlay():
+    amap = AccountMap.from_rows(ROWS)
+    amap.add('carol', 13)
+    assert amap.get('carol') == 13
+    assert amap.overlay_size == 1
+    assert amap.max_id == 13
+    assert len(amap) == 6
+    assert sorted(amap.items()) == sorted(ROWS + [('carol', 13)])
+
+def test_account_map_snapshot(tmp_path):
+    path = str(tmp_path / 'accounts.map')
+    amap = AccountMap.from_rows(ROWS)
+    amap.add('carol', 13)
+    amap.save(path)
+
+    loaded = AccountMap.load(path)
+    assert len(loaded) == 6
+    assert loaded.overlay_size == 0
+    assert loaded.max_id == 13
+    assert loaded.get('carol') == 13
+    assert loaded.get('ünï') == 5
+    assert loaded.get('dave') is None
+
+    loaded.add('dave', 14)
+    loaded.save(path)
+    assert AccountMap.load(path).get('dave') == 14
+
+def test_account_map_snapshot_invalid(tmp_path):
+    path = tmp_path / 'accounts.map'
+    path.write_bytes(b'x' * 64)
+    with pytest.raises(ValueError):
+        AccountMap.load(str(path))
@@ -0,0 +1,42 @@
+#pylint: disable=missing-docstring
+import pytest
+from hive.utils.bloom import ScalableBloomFilter
+
+def test_bloom_no_false_negatives():
+    bloom = ScalableBloomFilter(100, 0.01)
+    for i in range(1000):
+        bloom.add('alice/post-%d' % i)
+    # adds which hit a false positive are not counted
+    count = len(bloom)
+    assert 980 < count <= 1000
+    for i in range(1000):
+        assert 'alice/post-%d' % i in bloom
+    assert not bloom.add('alice/post-1')
+    assert len(bloom) == count
+
+def test_bloom_error_rate():
+    bloom = ScalableBloomFilter(1000, 0.01)
+    for i in range(5000):
+        bloom.add('a/%d' % i)
+    fps = sum(1 for i in range(10000) if 'b/%d' % i in bloom)
+    assert fps / 10000 < 0.02
+    assert bloom.est_error_rate() < 0.01
+
+def test_bloom_snapshot(tmp_path):
+    path = str(tmp_path / 'posts.bloom')
+    bloom = ScalableBloomFilter(10, 0.01)
+    for i in range(50):
+        bloom.add('bob/%d' % i)
+    bloom.watermark = 50
+    bloom.save(path)
+
+    loaded = ScalableBloomFilter.load(path)
+    assert loaded.watermark == 50
+    assert len(loaded) == 50
+    assert all('bob/%d' % i in loaded for i in range(50))
+    assert loaded.est_error_rate() == bloom.est_error_rate()
+
+    with open(path, 'ab') as f:
+        f.write(b'x')
+    with pytest.raises(ValueError):
+        ScalableBloomFilter.load(path)
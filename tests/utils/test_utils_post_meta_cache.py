@@ -0,0 +1,49 @@
+#pylint: disable=missing-docstring
+from hive.utils.post_meta_cache import PostMetaCache
+
+def test_post_meta_cache_basic():
+    cache = PostMetaCache(10)
+    assert cache.get('alice', 'hello') is None
+    cache.put('alice', 'hello', 5, 0, False, 5, 'travel', 'alice')
+    cache.put('bob', 're-hello', 6, 1, False, 5, 'travel', 'alice')
+    assert cache.get('alice', 'hello') == (5, 0, False, 5, 'travel', 'alice')
+    assert cache.get('bob', 're-hello') == (6, 1, False, 5, 'travel', 'alice')
+    assert len(cache) == 2
+
+    cache.set_deleted('bob', 're-hello')
+    assert cache.get('bob', 're-hello')[2] is True
+    cache.set_deleted('bob', 're-hello', False)
+    assert cache.get('bob', 're-hello')[2] is False
+
+    cache.put('alice', 'hello', 5, 0, False, 5, 'food', 'alice')
+    assert cache.get('alice', 'hello')[4] == 'food'
+    assert len(cache) == 2
+
+    cache.clear()
+    assert not cache
+    assert cache.get('alice', 'hello') is None
+
+def test_post_meta_cache_eviction():
+    cache = PostMetaCache(100)
+    for i in range(100):
+        cache.put('a', str(i), i + 1, 0, False, i + 1, 'c', 'a')
+    # touch the first half; CLOCK should evict untouched entries first
+    for i in range(50):
+        assert cache.get('a', str(i))[0] == i + 1
+    for i in range(100, 150):
+        cache.put('a', str(i), i + 1, 0, False, i + 1, 'c', 'a')
+    assert len(cache) == 100
+    for i in range(50):
+        assert cache.get('a', str(i))[0] == i + 1
+    assert sum(1 for i in range(50, 150) if cache.get('a', str(i))) == 50
+
+def test_post_meta_cache_churn():
+    cache = PostMetaCache(64)
+    for i in range(5000):
+        cache.put('a', str(i), i + 1, i % 7, False, 1, 'c', 'a')
+        assert cache.get('a', str(i))[0] == i + 1
+    assert len(cache) == 64
+    found = [i for i in range(5000) if cache.get('a', str(i))]
+    assert len(found) == 64
+    for i in found:
+        assert cache.get('a', str(i))[1] == i % 7